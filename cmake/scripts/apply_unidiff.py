@@ -3,10 +3,18 @@ import argparse
 import re
 from pathlib import Path
 
-BEGIN_RE = re.compile(r"^\*\*\* Begin Patch\s*$")
-END_RE   = re.compile(r"^\*\*\* End Patch\s*$")
-UPDATE_RE = re.compile(r"^\*\*\* Update File:\s*(.+?)\s*$")
-HUNK_RE = re.compile(r"^@@\s*$")
+# One alternation per line: a single C-level scan classifies it via m.lastgroup.
+LINE_RE = re.compile(
+    r"^(?:(?P<begin>\*\*\* Begin Patch\s*)"
+    r"|(?P<end>\*\*\* End Patch\s*)"
+    r"|\*\*\* Update File:\s*(?P<file>.+?)\s*"
+    r"|(?P<hunk>@@\s*))$"
+)
+_match_line = LINE_RE.match
+
+def line_kind(line: str):
+    m = _match_line(line)
+    return m.lastgroup if m else None
 
 def split_lines_keepends(s: str):
     return s.splitlines(True)
@@ -31,44 +39,39 @@ def parse_patchfile(text: str):
     ...
     *** End Patch
     """
-    lines = text.splitlines()
-    i = 0
+    # Single pass over one iterator: each line is classified by one regex match.
+    it = iter(text.splitlines())
 
-    # Find Begin
-    while i < len(lines) and not BEGIN_RE.match(lines[i]):
-        i += 1
-    if i >= len(lines):
+    for line in it:
+        if line_kind(line) == "begin":
+            break
+    else:
         raise ValueError("Missing '*** Begin Patch'")
 
-    i += 1
-
-    # Find Update File
-    while i < len(lines) and not UPDATE_RE.match(lines[i]):
-        i += 1
-    if i >= len(lines):
+    for line in it:
+        m = _match_line(line)
+        if m and m.lastgroup == "file":
+            file_in_patch = m.group("file").strip()
+            break
+    else:
         raise ValueError("Missing '*** Update File:'")
 
-    m = UPDATE_RE.match(lines[i])
-    file_in_patch = m.group(1).strip()
-    i += 1
-
     hunks = []
-    while i < len(lines) and not END_RE.match(lines[i]):
-        # Find @@
-        while i < len(lines) and not HUNK_RE.match(lines[i]) and not END_RE.match(lines[i]):
-            i += 1
-        if i >= len(lines) or END_RE.match(lines[i]):
+    append = hunks.append
+    hunk_lines = None
+    for line in it:
+        kind = line_kind(line)
+        if kind == "end":
             break
-        # consume @@
-        i += 1
-        hunk_lines = []
-        while i < len(lines) and not HUNK_RE.match(lines[i]) and not END_RE.match(lines[i]):
+        if kind == "hunk":
+            if hunk_lines:
+                append(hunk_lines)
+            hunk_lines = []
+        elif hunk_lines is not None and line and line[0] in (" ", "+", "-"):
             # valid lines start with ' ', '+', '-'
-            if lines[i] and lines[i][0] in (" ", "+", "-"):
-                hunk_lines.append(lines[i])
-            i += 1
-        if hunk_lines:
-            hunks.append(hunk_lines)
+            hunk_lines.append(line)
+    if hunk_lines:
+        append(hunk_lines)
 
     if not hunks:
         raise ValueError("No hunks found")
@@ -78,16 +81,15 @@ def parse_patchfile(text: str):
 def apply_hunks_to_file(target_path: Path, hunks):
     data = target_path.read_text(encoding="utf-8", errors="replace")
     nl = detect_newline(data)
-    file_lines = [ln + nl for ln in data.splitlines(False)]
+    joined = "".join(ln + nl for ln in data.splitlines(False))
     had_trailing_nl = data.endswith("\n") or data.endswith("\r\n")
 
-    def find_block(block, start_at=0):
-        # exact match block (list of lines with newline)
-        blen = len(block)
-        for pos in range(start_at, len(file_lines) - blen + 1):
-            if file_lines[pos:pos+blen] == block:
-                return pos
-        return None
+    def find_block(needle, start_at=0):
+        # exact match of whole lines: C-level str.find, accepted only at a line start
+        pos = joined.find(needle, start_at)
+        while pos > 0 and joined[pos - 1] != "\n":
+            pos = joined.find(needle, pos + 1)
+        return pos if pos >= 0 else None
 
     changed_any = False
 
@@ -104,15 +106,17 @@ def apply_hunks_to_file(target_path: Path, hunks):
             if tag in (" ", "+"):
                 new_block.append(line)
 
+        old_text = "".join(old_block)
+
         # If old_block matches somewhere, replace with new_block
-        pos = find_block(old_block, 0)
+        pos = find_block(old_text, 0)
         if pos is not None:
-            file_lines[pos:pos+len(old_block)] = new_block
+            joined = joined[:pos] + "".join(new_block) + joined[pos + len(old_text):]
             changed_any = True
             continue
 
         # If new_block already present, treat as already applied
-        pos2 = find_block(new_block, 0)
+        pos2 = find_block("".join(new_block), 0)
         if pos2 is not None:
             continue
 
@@ -123,7 +127,7 @@ def apply_hunks_to_file(target_path: Path, hunks):
         preview = "".join(old_block[:8])
         raise RuntimeError("Hunk does not match target file.\nPreview of expected old block:\n" + preview)
 
-    out = "".join(file_lines)
+    out = joined
     if not had_trailing_nl and out.endswith(nl):
         out = out[:-len(nl)]
 
@@ -1,21 +1,29 @@
 from __future__ import annotations
 
 import os
+import struct
 import time
 from dataclasses import dataclass
+from functools import cached_property
 from collections import deque
+from pathlib import Path
 
 import numpy as np
-import sounddevice as sd
-import keyboard
 
-from config import ServerConfig
+from config import ServerConfig, dvc_cache_root
 from log_utils import setup_timestamped_print, log_warn
 
 setup_timestamped_print()
 
 
 SR = 16000
+# Callback queue depth, in seconds of audio; older chunks drop if the consumer stalls.
+STREAM_QUEUE_SEC = 2.0
+
+# Pre-speech energy gate: frames quieter than RATIO x the noise floor (min frame
+# energy over the first CALIBRATION_MS of a capture) skip the neural VAD.
+VAD_GATE_CALIBRATION_MS = 300
+VAD_GATE_RATIO = 4.0
 
 
 def _env_str(key: str, default: str) -> str:
@@ -45,49 +53,178 @@ class VADConfig:
     min_utt_sec: float
     max_wait_sec: float
     thr: float
+    sr: int = SR
+
+    # Frame-count limits are fixed for the config's lifetime; derive them once.
+    @cached_property
+    def frame_sec(self) -> float:
+        return self.frame / self.sr
+
+    @cached_property
+    def frame_ms(self) -> float:
+        return self.frame_sec * 1000.0
+
+    def ms_to_frames(self, ms: int) -> int:
+        return int(ms) * self.sr // (self.frame * 1000)
+
+    @cached_property
+    def need_start(self) -> int:
+        return max(1, self.ms_to_frames(self.start_ms))
+
+    @cached_property
+    def need_end(self) -> int:
+        return max(1, self.ms_to_frames(self.end_sil_ms))
+
+    @cached_property
+    def max_frames(self) -> int:
+        return int(self.max_utt_sec / self.frame_sec)
+
+    @cached_property
+    def min_frames(self) -> int:
+        return int(self.min_utt_sec / self.frame_sec)
+
+    @cached_property
+    def max_wait_frames(self) -> int:
+        return int(self.max_wait_sec / self.frame_sec)
+
+
+SILERO_ONNX_URL = "https://raw.githubusercontent.com/snakers4/silero-vad/master/src/silero_vad/data/silero_vad.onnx"
+SILERO_ONNX_NAME = "silero_vad.onnx"
+
+
+def _ensure_silero_onnx() -> Path:
+    model_path = (dvc_cache_root() / "caches" / "silero" / SILERO_ONNX_NAME).resolve()
+    if model_path.exists():
+        return model_path
+
+    # vosk_models pulls in rich progress widgets; only needed on a cold cache.
+    from vosk_models import _download_file
+
+    print(f"[VAD] model '{SILERO_ONNX_NAME}' not found in cache -> downloading…", flush=True)
+    tmp_path = model_path.with_suffix(".part")
+    try:
+        _download_file(SILERO_ONNX_URL, tmp_path)
+        tmp_path.replace(model_path)
+    except Exception as e:
+        raise RuntimeError(
+            f"Failed to download Silero VAD model ({SILERO_ONNX_URL}): {e}\n"
+            f"Either enable internet once, or manually place the model into: {model_path}"
+        )
+    finally:
+        try:
+            if tmp_path.exists():
+                tmp_path.unlink()
+        except Exception:
+            pass
+    return model_path
 
 
 class SileroStreamVAD:
+    # Silero v5 ONNX graph: recurrent state (2, 1, 128) plus a short audio context
+    # carried over from the previous frame (64 samples at 16 kHz, 32 at 8 kHz).
+    STATE_SHAPE = (2, 1, 128)
+
     def __init__(self, sr: int = SR):
-        import torch
+        try:
+            import onnxruntime as ort
+        except Exception as e:
+            raise RuntimeError(f"onnxruntime is not installed: {e}")
 
-        self.torch = torch
         self.sr = sr
-        self.model, _ = torch.hub.load(
-            repo_or_dir="snakers4/silero-vad",
-            model="silero_vad",
-            force_reload=False,
-            trust_repo=True,
+        self._sr_arr = np.array(sr, dtype=np.int64)
+        self._context_size = 64 if sr == 16000 else 32
+
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = 1
+        opts.inter_op_num_threads = 1
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.sess = ort.InferenceSession(
+            str(_ensure_silero_onnx()),
+            sess_options=opts,
+            providers=["CPUExecutionProvider"],
         )
+        self._state = np.zeros(self.STATE_SHAPE, dtype=np.float32)
+        # Reused model input: [context | frame]; the context head is refilled
+        # from the previous frame's tail after each run.
+        self._scratch: np.ndarray | None = None
+        # Reused (k, n) float32 copy of each block, grown when a longer block arrives.
+        self._scaled: np.ndarray | None = None
         self.reset()
 
     def reset(self) -> None:
-        try:
-            self.model.reset_states()
-        except Exception:
-            pass
+        self._state.fill(0.0)
+        if self._scratch is not None:
+            self._scratch[:, :self._context_size] = 0.0
+
+    def _input_buffer(self, n: int) -> np.ndarray:
+        ctx = self._context_size
+        buf = self._scratch
+        if buf is None or buf.shape[1] != ctx + n:
+            grown = np.zeros((1, ctx + n), dtype=np.float32)
+            if buf is not None:
+                grown[:, :ctx] = buf[:, :ctx]
+            self._scratch = buf = grown
+        return buf
+
+    def speech_probs(self, frames: np.ndarray) -> np.ndarray:
+        """Run k consecutive (k, n) int16 frames through the model; returns (k,) probabilities.
+
+        The model is recurrent, so frames are still evaluated in order; batching
+        amortizes the int16->float32 conversion and per-call Python overhead.
+        """
+        k, n = frames.shape
+        ctx = self._context_size
+        x = self._input_buffer(n)
+        scaled = self._scaled
+        if scaled is None or scaled.shape[0] < k or scaled.shape[1] != n:
+            scaled = self._scaled = np.empty((k, n), dtype=np.float32)
+        scaled = np.multiply(frames, np.float32(1.0 / 32768.0), out=scaled[:k], dtype=np.float32)
+        probs = np.empty(k, dtype=np.float32)
+        run = self.sess.run
+        feed = {"input": x, "state": self._state, "sr": self._sr_arr}
+        for i in range(k):
+            x[0, ctx:] = scaled[i]
+            out, feed["state"] = run(None, feed)
+            x[:, :ctx] = x[:, -ctx:]
+            probs[i] = out.reshape(-1)[0]
+        self._state = feed["state"]
+        return probs
 
     def speech_prob(self, pcm16_fixed: np.ndarray) -> float:
-        x = pcm16_fixed.astype(np.float32) / 32768.0
-        t = self.torch.from_numpy(x)
-        with self.torch.no_grad():
-            p = self.model(t, self.sr)
-        try:
-            return float(p.item())
-        except Exception:
-            return float(p)
+        return float(self.speech_probs(pcm16_fixed.reshape(1, -1))[0])
 
     def is_speech_frame(self, pcm16_fixed: np.ndarray, thr: float) -> bool:
         return self.speech_prob(pcm16_fixed) >= thr
 
 
+# mono 16-bit PCM RIFF header
+_WAV_HEADER = struct.Struct("<4sI4s4sIHHIIHH4sI")
+
+
+def write_wav_int16(path: Path, pcm16: np.ndarray, sr: int = SR) -> None:
+    # Header plus the sample buffer as-is: no bytes copy, no wave-module header patching.
+    pcm = np.ascontiguousarray(pcm16, dtype="<i2")
+    nbytes = int(pcm.nbytes)
+    with open(path, "wb") as f:
+        f.write(_WAV_HEADER.pack(
+            b"RIFF", 36 + nbytes, b"WAVE",
+            b"fmt ", 16, 1, 1, sr, sr * 2, 2, 16,
+            b"data", nbytes,
+        ))
+        pcm.tofile(f)
+
+
 def _record_ptt(seconds: float, sr: int = SR) -> np.ndarray:
+    import sounddevice as sd
+
     audio = sd.rec(int(seconds * sr), samplerate=sr, channels=1, dtype="int16")
     sd.wait()
     return audio.reshape(-1)
 
 
 def _record_ptt_device(seconds: float, *, device=None, sr: int = SR) -> np.ndarray:
+    import sounddevice as sd
+
     audio = sd.rec(
         int(seconds * sr),
         samplerate=sr,
@@ -99,24 +236,23 @@ def _record_ptt_device(seconds: float, *, device=None, sr: int = SR) -> np.ndarr
     return audio.reshape(-1)
 
 
-def _frame_limits(frame: int, sr: int, start_ms: int, end_sil_ms: int, max_utt_sec: float, min_utt_sec: float, max_wait_sec: float):
-    frame_ms = (frame / sr) * 1000.0
-    need_start = max(1, int(start_ms / frame_ms))
-    need_end = max(1, int(end_sil_ms / frame_ms))
-    max_frames = int(max_utt_sec / (frame / sr))
-    min_frames = int(min_utt_sec / (frame / sr))
-    max_wait_frames = int(max_wait_sec / (frame / sr))
-    return frame_ms, need_start, need_end, max_frames, min_frames, max_wait_frames
-
-
 @dataclass
 class _VADRecordState:
-    frames: list[np.ndarray]
+    capture: np.ndarray
+    n_frames: int
+    pre_roll: np.ndarray
+    pre_roll_i: int
+    pre_roll_n: int
     started: bool
     speech_streak: int
     silence_streak: int
     waited_frames: int
-    buf: np.ndarray
+    ring: np.ndarray
+    write: int
+    read: int
+    noise_floor: float
+    calib_left: int
+    gate_open: bool
     t_listen0: float
     t_start: float | None
 
@@ -128,62 +264,123 @@ def _vad_meta(include_tail_sil: bool, silence_streak: int, frame_ms: float, t_wa
     return base
 
 
-def _vad_reached_stop(frames_len: int, max_frames: int, silence_streak: int, need_end: int, min_frames: int) -> bool:
-    if frames_len >= max_frames:
-        return True
-    return silence_streak >= need_end and frames_len >= min_frames
+def _capture_append(state: _VADRecordState, cur: np.ndarray) -> None:
+    n = cur.size
+    off = state.n_frames * n
+    np.copyto(state.capture[off:off + n], cur)
+    state.n_frames += 1
+
+
+def _pre_roll_push(state: _VADRecordState, cur: np.ndarray) -> None:
+    np.copyto(state.pre_roll[state.pre_roll_i], cur)
+    state.pre_roll_i = (state.pre_roll_i + 1) % state.pre_roll.shape[0]
+    state.pre_roll_n = min(state.pre_roll_n + 1, state.pre_roll.shape[0])
+
+
+def _pre_roll_flush(state: _VADRecordState) -> None:
+    # Oldest frame sits at pre_roll_i once the ring has wrapped: at most two copies.
+    i, n = state.pre_roll_i, state.pre_roll_n
+    parts = (state.pre_roll[i:], state.pre_roll[:i]) if n == state.pre_roll.shape[0] else (state.pre_roll[:n],)
+    for rows in parts:
+        off = state.n_frames * state.pre_roll.shape[1]
+        np.copyto(state.capture[off:off + rows.size], rows.reshape(-1))
+        state.n_frames += rows.shape[0]
+    state.pre_roll_i = 0
+    state.pre_roll_n = 0
 
 
 def _process_vad_frame(
     *,
     state: _VADRecordState,
     cur: np.ndarray,
-    vad: SileroStreamVAD,
-    thr: float,
+    speech: bool,
     need_start: int,
     need_end: int,
     max_frames: int,
     min_frames: int,
     max_wait_frames: int,
-    pre_roll_buf,
     pre_roll_frames: int,
 ):
+    if state.started:
+        # Post-start path runs for every captured frame: keep it to plain int checks.
+        _capture_append(state, cur)
+        silence = 0 if speech else state.silence_streak + 1
+        state.silence_streak = silence
+        n = state.n_frames
+        if n >= max_frames or (silence >= need_end and n >= min_frames):
+            return "stop"
+        return "continue"
+
     state.waited_frames += 1
-    if (not state.started) and state.waited_frames >= max_wait_frames:
+    if state.waited_frames >= max_wait_frames:
         return "no_speech"
 
-    speech = vad.is_speech_frame(cur, thr=thr)
-    if not state.started:
-        if pre_roll_frames > 0:
-            pre_roll_buf.append(cur.copy())
-        state.speech_streak = (state.speech_streak + 1) if speech else 0
-        if state.speech_streak >= need_start:
-            state.started = True
-            state.t_start = time.perf_counter()
-            if pre_roll_frames > 0 and len(pre_roll_buf) > 0:
-                state.frames.extend(list(pre_roll_buf))
-                pre_roll_buf.clear()
-            else:
-                state.frames.append(cur.copy())
-        return "continue"
-
-    state.frames.append(cur.copy())
-    state.silence_streak = 0 if speech else (state.silence_streak + 1)
-    if _vad_reached_stop(len(state.frames), max_frames, state.silence_streak, need_end, min_frames):
-        return "stop"
+    if pre_roll_frames > 0:
+        _pre_roll_push(state, cur)
+    state.speech_streak = (state.speech_streak + 1) if speech else 0
+    if state.speech_streak >= need_start:
+        state.started = True
+        state.t_start = time.perf_counter()
+        if pre_roll_frames > 0 and state.pre_roll_n > 0:
+            _pre_roll_flush(state)
+        else:
+            _capture_append(state, cur)
     return "continue"
 
 
-def _read_stream_block(stream) -> np.ndarray | None:
-    pcm, _ = stream.read(2048)
-    if pcm is None or pcm.size == 0:
+def _ring_push(state: _VADRecordState, pcm: np.ndarray) -> None:
+    n = pcm.size
+    if state.write + n > state.ring.size:
+        # Compact the unread tail to the front; grow only if a block still won't fit.
+        tail = state.write - state.read
+        if tail + n > state.ring.size:
+            grown = np.empty((tail + n) * 2, dtype=np.int16)
+            np.copyto(grown[:tail], state.ring[state.read:state.write])
+            state.ring = grown
+        else:
+            np.copyto(state.ring[:tail], state.ring[state.read:state.write])
+        state.read = 0
+        state.write = tail
+    np.copyto(state.ring[state.write:state.write + n], pcm)
+    state.write += n
+
+
+def _pre_speech_gate(state: _VADRecordState, block: np.ndarray) -> tuple[int, int] | None:
+    """[lo, hi) run of quiet frames that count as silence without running the model.
+
+    The gate only skips frames before the first loud one; from there on it stays
+    open and every frame goes through the recurrent model in order.
+    """
+    if state.gate_open:
+        return None
+    f = block.astype(np.float32)
+    energy = np.einsum("ij,ij->i", f, f) / block.shape[1]
+
+    n_cal = min(state.calib_left, energy.size)
+    if n_cal > 0:
+        state.noise_floor = min(state.noise_floor, float(energy[:n_cal].min()))
+        state.calib_left -= n_cal
+    if state.calib_left > 0:
+        return None
+
+    loud = np.flatnonzero(energy[n_cal:] >= (state.noise_floor * VAD_GATE_RATIO))
+    end = energy.size
+    if loud.size:
+        state.gate_open = True
+        end = n_cal + int(loud[0])
+    if end <= n_cal:
         return None
-    return pcm.reshape(-1)
+    return n_cal, end
+
+
+def _abort_payload(state: _VADRecordState, include_tail_sil: bool, frame_ms: float, reason: str):
+    t_now = time.perf_counter()
+    return None, _vad_meta(include_tail_sil, state.silence_streak, frame_ms, t_now - state.t_listen0, 0.0, 0.0), reason
 
 
-def _abort_if_needed(should_abort, abort_payload):
+def _abort_if_needed(should_abort, state: _VADRecordState, include_tail_sil: bool, frame_ms: float):
     if should_abort():
-        return abort_payload("pipe")
+        return _abort_payload(state, include_tail_sil, frame_ms, "pipe")
     return None
 
 
@@ -198,36 +395,55 @@ def _consume_vad_buffer(
     max_frames: int,
     min_frames: int,
     max_wait_frames: int,
-    pre_roll_buf,
     pre_roll_frames: int,
     should_abort,
-    abort_payload,
+    include_tail_sil: bool,
+    frame_ms: float,
 ):
     status = "continue"
-    while state.buf.size >= frame and status == "continue":
-        aborted = _abort_if_needed(should_abort, abort_payload)
+    k = (state.write - state.read) // frame
+    if k <= 0:
+        return status, None
+
+    # One model call per stream block; the streak logic then walks the results.
+    block = state.ring[state.read:state.read + k * frame].reshape(k, frame)
+    # Gated frames form one run before the first loud frame; scored frames stay in stream order.
+    lo, hi = _pre_speech_gate(state, block) or (k, k)
+    speech_flags = np.zeros(k, dtype=bool)
+    if lo > 0:
+        speech_flags[:lo] = vad.speech_probs(block[:lo]) >= thr
+        if not state.gate_open and speech_flags[:lo].any():
+            # Speech during calibration: the noise floor is not silence, so stop gating.
+            state.gate_open = True
+            hi = lo
+    if hi < k:
+        speech_flags[hi:] = vad.speech_probs(block[hi:]) >= thr
+
+    for i in range(k):
+        aborted = _abort_if_needed(should_abort, state, include_tail_sil, frame_ms)
         if aborted is not None:
             return status, aborted
 
-        cur = state.buf[:frame]
-        state.buf = state.buf[frame:]
+        cur = block[i]
+        state.read += frame
+        speech = bool(speech_flags[i])
 
         status = _process_vad_frame(
             state=state,
             cur=cur,
-            vad=vad,
-            thr=thr,
+            speech=speech,
             need_start=need_start,
             need_end=need_end,
             max_frames=max_frames,
             min_frames=min_frames,
             max_wait_frames=max_wait_frames,
-            pre_roll_buf=pre_roll_buf,
             pre_roll_frames=pre_roll_frames,
         )
 
         if status == "no_speech":
-            return status, abort_payload("no_speech")
+            return status, _abort_payload(state, include_tail_sil, frame_ms, "no_speech")
+        if status != "continue":
+            break
 
     return status, None
 
@@ -235,62 +451,74 @@ def _consume_vad_buffer(
 def _record_vad_generic(
     *,
     vad: SileroStreamVAD,
-    frame: int,
-    thr: float,
-    need_start: int,
-    need_end: int,
-    max_frames: int,
-    min_frames: int,
-    max_wait_frames: int,
+    cfg: VADConfig,
     pre_roll_ms: int,
     should_abort,
     include_tail_sil: bool,
     device,
-    sr: int = SR,
+    on_speech=None,
 ):
-    frame_ms = (frame / sr) * 1000.0
-    pre_roll_frames = max(0, int(pre_roll_ms / frame_ms))
-    pre_roll_buf = deque(maxlen=max(1, pre_roll_frames)) if pre_roll_frames > 0 else deque(maxlen=1)
+    import sounddevice as sd
+
+    frame, sr, thr = cfg.frame, cfg.sr, cfg.thr
+    frame_ms, frame_sec = cfg.frame_ms, cfg.frame_sec
+    need_start, need_end = cfg.need_start, cfg.need_end
+    max_frames, min_frames, max_wait_frames = cfg.max_frames, cfg.min_frames, cfg.max_wait_frames
+    pre_roll_frames = max(0, cfg.ms_to_frames(pre_roll_ms))
     vad.reset()
 
     state = _VADRecordState(
-        frames=[],
+        # Stop triggers at max_frames; pre-roll may front-load up to pre_roll_frames more.
+        capture=np.empty((max_frames + max(1, pre_roll_frames)) * frame, dtype=np.int16),
+        n_frames=0,
+        pre_roll=np.empty((max(1, pre_roll_frames), frame), dtype=np.int16),
+        pre_roll_i=0,
+        pre_roll_n=0,
         started=False,
         speech_streak=0,
         silence_streak=0,
         waited_frames=0,
-        buf=np.zeros((0,), dtype=np.int16),
+        ring=np.empty(frame * 8, dtype=np.int16),
+        write=0,
+        read=0,
+        noise_floor=float("inf"),
+        calib_left=max(1, cfg.ms_to_frames(VAD_GATE_CALIBRATION_MS)),
+        gate_open=False,
         t_listen0=time.perf_counter(),
         t_start=None,
     )
 
-    def _meta(t_wait: float, t_vad: float, utt_sec: float):
-        return _vad_meta(include_tail_sil, state.silence_streak, frame_ms, t_wait, t_vad, utt_sec)
+    status = "continue"
+    # Samples of state.capture already handed to on_speech.
+    fed = 0
 
-    def _abort_payload(reason: str):
-        t_now = time.perf_counter()
-        return None, _meta((t_now - state.t_listen0), 0.0, 0.0), reason
+    # PortAudio thread -> this thread. deque append/popleft are atomic under the
+    # GIL, so with a single producer and consumer no extra locking is needed.
+    chunks: deque = deque(maxlen=max(8, int(STREAM_QUEUE_SEC * sr / frame)))
 
-    status = "continue"
+    def _on_audio(indata, _frames, _time, _status):
+        # Raw CFFI buffer: view it as int16, copy once since PortAudio reuses it.
+        chunks.append(np.frombuffer(indata, dtype=np.int16).copy())
 
-    with sd.InputStream(
+    with sd.RawInputStream(
         samplerate=sr,
         channels=1,
         dtype="int16",
-        blocksize=2048,
+        blocksize=frame,
         device=device,
-    ) as stream:
+        callback=_on_audio,
+    ):
         while status == "continue":
-            aborted = _abort_if_needed(should_abort, _abort_payload)
+            aborted = _abort_if_needed(should_abort, state, include_tail_sil, frame_ms)
             if aborted is not None:
                 return aborted
 
-            pcm = _read_stream_block(stream)
-            if pcm is None:
-                time.sleep(0.001)
+            if not chunks:
+                time.sleep(0.002)
                 continue
 
-            state.buf = np.concatenate([state.buf, pcm])
+            while chunks:
+                _ring_push(state, chunks.popleft())
             status, payload = _consume_vad_buffer(
                 state=state,
                 frame=frame,
@@ -301,86 +529,63 @@ def _record_vad_generic(
                 max_frames=max_frames,
                 min_frames=min_frames,
                 max_wait_frames=max_wait_frames,
-                pre_roll_buf=pre_roll_buf,
                 pre_roll_frames=pre_roll_frames,
                 should_abort=should_abort,
-                abort_payload=_abort_payload,
+                include_tail_sil=include_tail_sil,
+                frame_ms=frame_ms,
             )
             if payload is not None:
                 return payload
+            if on_speech is not None and state.n_frames * frame > fed:
+                # Hand over only the new samples so the consumer can decode while we keep listening.
+                end = state.n_frames * frame
+                on_speech(state.capture[fed:end])
+                fed = end
 
     t_end = time.perf_counter()
     t_wait = (state.t_start - state.t_listen0) if (state.t_start is not None) else (t_end - state.t_listen0)
     t_vad = (t_end - state.t_start) if (state.t_start is not None) else 0.0
 
-    if len(state.frames) < min_frames:
-        return None, _meta(t_wait, t_vad, len(state.frames) * (frame / sr)), "no_speech"
+    if state.n_frames < min_frames:
+        meta = _vad_meta(include_tail_sil, state.silence_streak, frame_ms, t_wait, t_vad, state.n_frames * frame_sec)
+        return None, meta, "no_speech"
 
-    pcm16 = np.concatenate(state.frames)
-    return pcm16, _meta(t_wait, t_vad, pcm16.size / sr), "ok"
+    pcm16 = state.capture[:state.n_frames * frame]
+    return pcm16, _vad_meta(include_tail_sil, state.silence_streak, frame_ms, t_wait, t_vad, pcm16.size / sr), "ok"
 
 
-def _record_vad_stream(vad: SileroStreamVAD, cfg: VADConfig, should_abort, *, device=None, sr: int = SR):
-    _frame_ms, need_start, need_end, max_frames, min_frames, max_wait_frames = _frame_limits(
-        cfg.frame,
-        sr,
-        cfg.start_ms,
-        cfg.end_sil_ms,
-        cfg.max_utt_sec,
-        cfg.min_utt_sec,
-        cfg.max_wait_sec,
-    )
+def _record_vad_stream(vad: SileroStreamVAD, cfg: VADConfig, should_abort, *, device=None):
     return _record_vad_generic(
         vad=vad,
-        frame=cfg.frame,
-        thr=cfg.thr,
-        need_start=need_start,
-        need_end=need_end,
-        max_frames=max_frames,
-        min_frames=min_frames,
-        max_wait_frames=max_wait_frames,
+        cfg=cfg,
         pre_roll_ms=0,
         should_abort=should_abort,
         include_tail_sil=True,
         device=device,
-        sr=sr,
     )
 
 
-def _record_vad_open(
-    vad: SileroStreamVAD,
-    vad_frame: int,
-    vad_thr: float,
-    open_end_sil_ms: int,
-    open_max_rec_sec: float,
-    should_abort,
-    *,
-    device=None,
-    sr: int = SR,
-):
-    _frame_ms, need_start, need_end, max_frames, min_frames, max_wait_frames = _frame_limits(
-        vad_frame,
-        sr,
+def _open_vad_config(vad_frame: int, vad_thr: float, open_end_sil_ms: int, open_max_rec_sec: float, sr: int = SR) -> VADConfig:
+    return VADConfig(
+        frame=vad_frame,
         start_ms=100,
         end_sil_ms=open_end_sil_ms,
         max_utt_sec=open_max_rec_sec,
         min_utt_sec=0.3,
         max_wait_sec=3.0,
+        thr=vad_thr,
+        sr=sr,
     )
+
+
+def _record_vad_open(vad: SileroStreamVAD, cfg: VADConfig, should_abort, *, device=None):
     return _record_vad_generic(
         vad=vad,
-        frame=vad_frame,
-        thr=vad_thr,
-        need_start=need_start,
-        need_end=need_end,
-        max_frames=max_frames,
-        min_frames=min_frames,
-        max_wait_frames=max_wait_frames,
+        cfg=cfg,
         pre_roll_ms=0,
         should_abort=should_abort,
         include_tail_sil=False,
         device=device,
-        sr=sr,
     )
 
 
@@ -411,6 +616,14 @@ class AudioPipeline:
             min_utt_sec=_env_float("DVC_VAD_MIN_UTT", float(self.cfg.vad_min_utt)),
             max_wait_sec=_env_float("DVC_VAD_MAX_WAIT", float(self.cfg.vad_max_wait)),
             thr=self.vad_thr,
+            sr=SR,
+        )
+        self._open_vad_cfg = _open_vad_config(
+            self.vad_frame,
+            self.vad_thr,
+            self.open_vad_end_sil_ms,
+            self.open_max_rec_sec,
+            sr=SR,
         )
         self.vad_preroll_ms = _env_int(
             "DVC_VAD_PREROLL_MS",
@@ -444,6 +657,8 @@ class AudioPipeline:
         return self._vad
 
     def _resolve_input_device(self):
+        import sounddevice as sd
+
         set_mic_raw = str(self.SetMic).strip()
         if set_mic_raw:
             try:
@@ -465,6 +680,8 @@ class AudioPipeline:
 
     def active_input_device_label(self) -> str:
         try:
+            import sounddevice as sd
+
             if self.input_device is not None and int(self.input_device) >= 0:
                 idx = int(self.input_device)
                 d = sd.query_devices(idx)
@@ -480,18 +697,17 @@ class AudioPipeline:
         vad = self._ensure_vad()
         return _record_vad_open(
             vad,
-            vad_frame=self.vad_frame,
-            vad_thr=self.vad_thr,
-            open_end_sil_ms=self.open_vad_end_sil_ms,
-            open_max_rec_sec=self.open_max_rec_sec,
+            self._open_vad_cfg,
             should_abort=self._should_abort,
             device=self.input_device,
-            sr=SR,
         )
 
-    def capture_for_dialogue(self):
-        # Returns (pcm16|None, meta, reason)
+    def capture_for_dialogue(self, on_speech=None):
+        # Returns (pcm16|None, meta, reason). In VAD mode on_speech(chunk) receives the
+        # captured samples incrementally while recording is still running.
         if self.mode == "ptt":
+            import keyboard
+
             if not keyboard.is_pressed(self.hotkey):
                 return None, {"t_wait": 0.0, "t_vad": 0.0, "utt_sec": 0.0, "tail_sil_ms": 0.0}, "no_hotkey"
             time.sleep(0.15)
@@ -508,7 +724,7 @@ class AudioPipeline:
             pre_roll_ms=self.vad_preroll_ms,
             should_abort=self._should_abort,
             device=self.input_device,
-            sr=SR,
+            on_speech=on_speech,
         )
 
 
@@ -519,29 +735,14 @@ def _record_vad_stream_with_preroll(
     should_abort,
     *,
     device=None,
-    sr: int = SR,
+    on_speech=None,
 ):
-    _frame_ms, need_start, need_end, max_frames, min_frames, max_wait_frames = _frame_limits(
-        cfg.frame,
-        sr,
-        cfg.start_ms,
-        cfg.end_sil_ms,
-        cfg.max_utt_sec,
-        cfg.min_utt_sec,
-        cfg.max_wait_sec,
-    )
     return _record_vad_generic(
         vad=vad,
-        frame=cfg.frame,
-        thr=cfg.thr,
-        need_start=need_start,
-        need_end=need_end,
-        max_frames=max_frames,
-        min_frames=min_frames,
-        max_wait_frames=max_wait_frames,
+        cfg=cfg,
         pre_roll_ms=pre_roll_ms,
         should_abort=should_abort,
         include_tail_sil=True,
         device=device,
-        sr=sr,
+        on_speech=on_speech,
     )
\ No newline at end of file
@@ -1,6 +1,9 @@
 from dataclasses import dataclass
+from functools import lru_cache
 from contextlib import suppress
 import configparser
+import os
+import sys
 from pathlib import Path
 from typing import Any, Callable
 
@@ -37,8 +40,6 @@ class ServerConfig:
     ptt_sec: float = 3.0
     SetMic: str = ""
 
-    inmem_audio: bool = True
-
     # Open phrases (voice-triggered dialogue open)
     open_phrases: str = ""
     open_score_thr: float = 0.4
@@ -60,6 +61,17 @@ class ServerConfig:
     shouts_vosk_model: str = ""
 
 
+@lru_cache(maxsize=1)
+def dvc_cache_root() -> Path:
+    """DVC_CACHE_DIR if set, else the runtime folder (the exe's folder when frozen)."""
+    cache_root_env = os.environ.get("DVC_CACHE_DIR", "").strip()
+    if cache_root_env:
+        return Path(cache_root_env).expanduser().resolve()
+    if bool(getattr(sys, "frozen", False)):
+        return Path(sys.executable).resolve().parent
+    return Path(__file__).resolve().parent
+
+
 _MISSING = object()
 
 
@@ -68,14 +80,6 @@ _TEXT_LOWER = lambda v: v.strip().lower()
 _IDENTITY = lambda v: v
 
 
-_READERS: dict[str, Callable[[configparser.ConfigParser, str, str], Any]] = {
-    "get": lambda cfg, section, option: cfg.get(section, option),
-    "getint": lambda cfg, section, option: cfg.getint(section, option),
-    "getfloat": lambda cfg, section, option: cfg.getfloat(section, option),
-    "getboolean": lambda cfg, section, option: cfg.getboolean(section, option),
-}
-
-
 _LOAD_RULES = (
     ("asr_engine", "get", _TEXT_LOWER, (("ASR", "Engine"),)),
     ("asr_lang", "get", _TEXT_LOWER, (("Whisper", "Language"),)),
@@ -101,7 +105,6 @@ _LOAD_RULES = (
     ("ptt_key", "get", _TEXT_LOWER, (("PTT", "Hotkey"),)),
     ("ptt_sec", "getfloat", _IDENTITY, (("PTT", "Seconds"),)),
     ("SetMic", "get", _TEXT, (("Mode", "SetMic"),)),
-    ("inmem_audio", "getboolean", _IDENTITY, (("Whisper", "InMemAudio"),)),
     ("open_phrases", "get", _TEXT, (("Open", "OpenPhrases"),)),
     ("open_score_thr", "getfloat", _IDENTITY, (("Open", "ScoreThreshold"),)),
     ("open_max_rec_sec", "getfloat", _IDENTITY, (("Open", "MaxRecordSec"),)),
@@ -117,11 +120,15 @@ _LOAD_RULES = (
 )
 
 
-def _pick(cfg: configparser.ConfigParser, getter: str, sources):
-    read = _READERS[getter]
+def _pick(has: Callable[[str, str], bool], read: Callable[[str, str], Any], sources):
+    # has_option is a dict lookup (False for a missing section too), so absent keys never raise.
     for section, option in sources:
-        with suppress(configparser.NoOptionError, configparser.NoSectionError, ValueError):
-            return read(cfg, section, option)
+        if not has(section, option):
+            continue
+        try:
+            return read(section, option)
+        except ValueError:
+            continue
     return _MISSING
 
 def load_config(ini: Path) -> ServerConfig:
@@ -132,18 +139,18 @@ def load_config(ini: Path) -> ServerConfig:
         ini_path = Path(ini)
         ini_path.exists() and cfg.read(ini_path, encoding="utf-8")
 
-    for attr, getter, transform, sources in _LOAD_RULES:
-        value = _pick(cfg, getter, sources)
+    # Bind the typed getters once for this parser instead of dispatching per rule.
+    rules = [(attr, getattr(cfg, getter), transform, sources) for attr, getter, transform, sources in _LOAD_RULES]
+
+    has = cfg.has_option
+    picked: set[str] = set()
+    for attr, read, transform, sources in rules:
+        value = _pick(has, read, sources)
         if value is _MISSING:
             continue
-        if attr == "asr_lang":
-            setattr(c, attr, transform(value))
-            c.asr_lang_specified = True
-            continue
-        if attr == "cuda":
-            setattr(c, attr, transform(value))
-            c.cuda_specified = True
-            continue
         setattr(c, attr, transform(value))
+        picked.add(attr)
 
-    return c
\ No newline at end of file
+    c.asr_lang_specified = "asr_lang" in picked
+    c.cuda_specified = "cuda" in picked
+    return c
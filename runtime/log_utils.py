@@ -1,17 +1,46 @@
 import builtins
 import sys
-from datetime import datetime
+import time
 from typing import Optional, TextIO
 
-from rich.console import Console
+
+_ts_last_sec = -1
+_ts_prefix = ""
 
 
 def _ts_now() -> str:
-    return datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+    # Reformat the date/time part only when the second changes; append millis.
+    global _ts_last_sec, _ts_prefix
+    t = time.time()
+    sec = int(t)
+    if sec != _ts_last_sec:
+        _ts_prefix = time.strftime("%Y-%m-%d %H:%M:%S.", time.localtime(sec))
+        _ts_last_sec = sec
+    return f"{_ts_prefix}{int((t - sec) * 1000):03d}"
+
+
+_ANSI = {"yellow": "\x1b[33m", "red": "\x1b[31m", "green": "\x1b[32m"}
+_RESET = "\x1b[0m"
+_ansi_ready = False
+_log_file: Optional[TextIO] = None
 
 
-_console = Console(file=sys.__stdout__, force_terminal=True)
-_log_file: Optional[TextIO] = None
+def _enable_ansi() -> None:
+    # Classic Windows consoles only honour SGR codes once VT processing is switched on.
+    global _ansi_ready
+    _ansi_ready = True
+    if sys.platform != "win32":
+        return
+    try:
+        import ctypes
+
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.GetStdHandle(-11)
+        mode = ctypes.c_uint32()
+        if kernel32.GetConsoleMode(handle, ctypes.byref(mode)):
+            kernel32.SetConsoleMode(handle, mode.value | 0x0004)
+    except Exception:
+        pass
 
 
 def set_log_file(file: Optional[TextIO]) -> None:
@@ -34,10 +63,14 @@ def setup_timestamped_print() -> None:
 
         msg = sep.join(str(a) for a in args) + end
         prefix = f"[{_ts_now()}] "
-        lines = msg.splitlines(True)
-        if not lines:
-            lines = [""]
-        file.write("".join(prefix + line if line != "" else prefix for line in lines))
+        # Prefix every line; a trailing newline must not open an empty prefixed line.
+        if msg.endswith("\n"):
+            body, tail = msg[:-1], "\n"
+        else:
+            body, tail = msg, ""
+        if "\n" in body:
+            body = body.replace("\n", "\n" + prefix)
+        file.write(prefix + body + tail)
         if flush:
             file.flush()
 
@@ -48,14 +81,27 @@ def setup_timestamped_print() -> None:
 def _log_color(text: str, color: str) -> None:
     ts = _ts_now()
     lines = str(text).splitlines() or [""]
-    for line in lines:
-        if _log_file is not None:
-            try:
+    if _log_file is not None:
+        try:
+            # Drain any partial print line the stdout/stderr tee is still holding first.
+            sys.stdout.flush()
+            for line in lines:
                 _log_file.write(f"[{ts}] {line}\n")
-                _log_file.flush()
-            except Exception:
-                pass
-        _console.print(f"[{color}][{ts}] {line}[/]")
+            _log_file.flush()
+        except Exception:
+            pass
+    out = sys.__stdout__
+    if out is None:
+        return
+    if not _ansi_ready:
+        _enable_ansi()
+    sgr = _ANSI.get(color, "")
+    try:
+        for line in lines:
+            out.write(f"{sgr}[{ts}] {line}{_RESET}\n")
+        out.flush()
+    except Exception:
+        pass
 
 
 def log_warn(text: str) -> None:
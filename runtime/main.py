@@ -1,13 +1,8 @@
 import os
 import sys
-import traceback
-import subprocess
+import threading
 from pathlib import Path
 
-from rich.console import Console
-from rich.rule import Rule
-from rich.align import Align
-
 # ---------------- paths ----------------
 IS_FROZEN = bool(getattr(sys, "frozen", False))
 if IS_FROZEN:
@@ -56,24 +51,52 @@ from log_utils import setup_timestamped_print, log_warn, log_error, set_log_file
 setup_timestamped_print()
 
 from config import ServerConfig, load_config
-from vosk_models import ensure_vosk_model
 PYWIN32_HINT = "Install pywin32"
 INI_FILENAMES = ("DVCRuntime.ini", "Dragonborn Voice Control.ini")
 
 # ---------------- logging to file (and console) ----------------
 class Tee:
+    # Partial writes are coalesced: the log fd is written once per completed line (or 4 KiB).
+    FLUSH_AT = 4096
+    _NL = os.linesep.encode("ascii")
+    # stdout and stderr tee into the same file: one buffer and lock per fd keeps their lines whole and ordered.
+    _shared: dict[int, tuple[bytearray, threading.Lock]] = {}
+
     def __init__(self, f):
         self.f = f
-    def write(self, s):
+        self._fd = f.fileno()
+        self._buf, self._lock = self._shared.setdefault(self._fd, (bytearray(), threading.Lock()))
+
+    def _drain(self):
+        # Caller holds _lock. log_utils flushes this buffer before its own writes and
+        # flushes the text layer of f after them, so going straight to the fd keeps the file in order.
+        data = bytes(self._buf)
+        self._buf.clear()
         try:
-            self.f.write(s); self.f.flush()
+            while data:
+                data = data[os.write(self._fd, data):]
         except Exception:
             pass
+
+    def write(self, s):
+        data = s.encode("utf-8", errors="replace")
+        if self._NL != b"\n":
+            data = data.replace(b"\n", self._NL)
+        with self._lock:
+            self._buf += data
+            if b"\n" in data or len(self._buf) >= self.FLUSH_AT:
+                self._drain()
         try:
-            sys.__stdout__.write(s); sys.__stdout__.flush()
+            sys.__stdout__.write(s)
+            if "\n" in s:
+                sys.__stdout__.flush()
         except Exception:
             pass
+        return len(s)
+
     def flush(self):
+        with self._lock:
+            self._drain()
         try:
             self.f.flush()
         except Exception:
@@ -112,6 +135,11 @@ def _init_log():
 
 
 def _print_server_header() -> None:
+    # rich pulls in a sizeable import tree; load it only when the header is printed.
+    from rich.console import Console
+    from rich.rule import Rule
+    from rich.align import Align
+
     console = Console(file=sys.__stdout__, force_terminal=True)
     console.print(Rule(style="dim"))
     console.print(Align.center("[bold green]Dragonborn Voice Control[/]"))
@@ -131,15 +159,32 @@ def _ini_from_argv(argv: list[str]) -> Path | None:
     return None
 
 
-def _iter_default_ini_candidates():
-    yield from (MOD_DIR / "SKSE" / "Plugins" / name for name in INI_FILENAMES)
-    yield from (MOD_DIR / name for name in INI_FILENAMES)
+_INI_NAMES_LOWER = tuple(name.lower() for name in INI_FILENAMES)
 
 
-def _iter_fallback_ini_candidates(max_levels: int = 6):
+def _ini_in_dir(d: Path) -> Path | None:
+    # One directory read per location instead of a stat per candidate name.
+    try:
+        with os.scandir(d) as it:
+            names = {e.name.lower(): e.name for e in it}
+    except OSError:
+        return None
+    for want in _INI_NAMES_LOWER:
+        hit = names.get(want)
+        if hit is not None:
+            return d / hit
+    return None
+
+
+def _iter_default_ini_dirs():
+    yield MOD_DIR / "SKSE" / "Plugins"
+    yield MOD_DIR
+
+
+def _iter_fallback_ini_dirs(max_levels: int = 6):
     for base in list(RUNTIME_DIR.parents)[:max_levels]:
-        yield from (base / "Data" / "SKSE" / "Plugins" / name for name in INI_FILENAMES)
-        yield from (base / name for name in INI_FILENAMES)
+        yield base / "Data" / "SKSE" / "Plugins"
+        yield base
 
 
 def _find_ini() -> Path | None:
@@ -147,12 +192,14 @@ def _find_ini() -> Path | None:
     if ini_arg is not None:
         return ini_arg
 
-    for cand in _iter_default_ini_candidates():
-        if cand.exists():
+    for d in _iter_default_ini_dirs():
+        cand = _ini_in_dir(d)
+        if cand is not None:
             return cand
 
-    for cand in _iter_fallback_ini_candidates():
-        if cand.exists():
+    for d in _iter_fallback_ini_dirs():
+        cand = _ini_in_dir(d)
+        if cand is not None:
             return cand
     return None
 
@@ -208,6 +255,8 @@ def _resolve_backend_settings(cfg):
 def _ensure_vosk_models_for_settings(asr: dict) -> str:
     vosk_model_path = ""
     if asr["asr_engine"] == "vosk":
+        from vosk_models import ensure_vosk_model
+
         try:
             mp = ensure_vosk_model(asr["vosk_model_name"], CACHE / "vosk")
             vosk_model_path = str(mp)
@@ -218,68 +267,58 @@ def _ensure_vosk_models_for_settings(asr: dict) -> str:
 
 
 def _export_runtime_env(cfg, asr: dict, backend_eff: str, cuda: str, vosk_model_path: str, *, cuda_specified: bool) -> None:
-    os.environ["DVC_BACKEND"] = backend_eff
-    if cuda_specified:
-        os.environ["DVC_CUDA"] = cuda
-    else:
-        os.environ.pop("DVC_CUDA", None)
-
-    os.environ["DVC_ASR_ENGINE"] = asr["asr_engine"]
-    if asr.get("asr_lang_specified"):
-        os.environ["DVC_ASR_LANG"] = asr["asr_lang"]
-    else:
-        os.environ.pop("DVC_ASR_LANG", None)
-    os.environ["DVC_VOSK_MODEL"] = asr["vosk_model_name"]
+    def _flag(v) -> str:
+        return "1" if bool(v) else "0"
+
+    lang_specified = bool(asr.get("asr_lang_specified"))
+    env = {
+        "DVC_BACKEND": backend_eff,
+        "DVC_CUDA": cuda if cuda_specified else None,
+        "DVC_ASR_ENGINE": asr["asr_engine"],
+        "DVC_ASR_LANG": asr["asr_lang"] if lang_specified else None,
+        "DVC_VOSK_MODEL": asr["vosk_model_name"],
+        "DVC_WHISPER_MODEL": cfg.whisper_model,
+        "DVC_WHISPER_LANG": asr["asr_lang"] if lang_specified else None,
+        "DVC_WHISPER_BEAM": cfg.whisper_beam,
+        "DVC_WHISPER_VOICE_COMMANDS": _flag(cfg.whisper_voice_commands),
+        "DVC_MIN_SCORE": cfg.min_score,
+        "DVC_MIN_DIFF": cfg.min_diff,
+        "DVC_MODE": cfg.mode,
+        "DVC_SetMic": cfg.SetMic,
+        "DVC_PTT_KEY": cfg.ptt_key,
+        "DVC_PTT_SEC": cfg.ptt_sec,
+        "DVC_VAD_START_MS": cfg.vad_start_ms,
+        "DVC_VAD_END_SIL_MS": cfg.vad_end_sil_ms,
+        "DVC_VAD_MAX_UTT": cfg.vad_max_utt,
+        "DVC_VAD_MIN_UTT": cfg.vad_min_utt,
+        "DVC_VAD_MAX_WAIT": cfg.vad_max_wait,
+        "DVC_VAD_THR": cfg.vad_thr,
+        "DVC_VAD_PREROLL_MS": cfg.vad_preroll_ms,
+        "DVC_OPEN_PHRASES": cfg.open_phrases,
+        "DVC_OPEN_SCORE_THR": cfg.open_score_thr,
+        "DVC_OPEN_MAX_REC_SEC": cfg.open_max_rec_sec,
+        "DVC_OPEN_VAD_END_SIL_MS": cfg.open_vad_end_sil_ms,
+        "DVC_CLOSE_PHRASES": cfg.close_phrases,
+        "DVC_CLOSE_SCORE_THR": cfg.close_score_thr,
+        "DVC_OPEN_ENABLE_OPEN": _flag(cfg.open_enable_open),
+        "DVC_CLOSE_ENABLE_VOICE": _flag(cfg.close_enable_voice),
+        "DVC_SHOUTS_ENABLE": _flag(cfg.shouts_enable),
+        "DVC_SHOUTS_BACKEND": asr["shouts_backend"],
+        "DVC_SHOUTS_LANG": asr["shouts_lang"],
+        "DVC_SHOUTS_VOSK_MODEL": asr["shouts_vosk_model_name"],
+        # Shouts Vosk model path is resolved lazily at runtime on CFG|SHOUTS|1.
+        "DVC_SHOUTS_VOSK_MODEL_PATH": None,
+    }
     if vosk_model_path:
-        os.environ["DVC_VOSK_MODEL_PATH"] = vosk_model_path
-
-    os.environ["DVC_WHISPER_MODEL"] = str(cfg.whisper_model)
-    if asr.get("asr_lang_specified"):
-        os.environ["DVC_WHISPER_LANG"] = str(asr["asr_lang"])
-    else:
-        os.environ.pop("DVC_WHISPER_LANG", None)
-    os.environ["DVC_WHISPER_BEAM"] = str(cfg.whisper_beam)
-    os.environ["DVC_WHISPER_VOICE_COMMANDS"] = "1" if bool(cfg.whisper_voice_commands) else "0"
-
-    os.environ["DVC_MIN_SCORE"] = str(cfg.min_score)
-    os.environ["DVC_MIN_DIFF"] = str(cfg.min_diff)
-
-    os.environ["DVC_MODE"] = str(cfg.mode)
-    os.environ["DVC_SetMic"] = str(cfg.SetMic)
-    os.environ["DVC_PTT_KEY"] = str(cfg.ptt_key)
-    os.environ["DVC_PTT_SEC"] = str(cfg.ptt_sec)
-
-    os.environ["DVC_VAD_START_MS"] = str(cfg.vad_start_ms)
-    os.environ["DVC_VAD_END_SIL_MS"] = str(cfg.vad_end_sil_ms)
-    os.environ["DVC_VAD_MAX_UTT"] = str(cfg.vad_max_utt)
-    os.environ["DVC_VAD_MIN_UTT"] = str(cfg.vad_min_utt)
-    os.environ["DVC_VAD_MAX_WAIT"] = str(cfg.vad_max_wait)
-    os.environ["DVC_VAD_THR"] = str(cfg.vad_thr)
-    os.environ["DVC_VAD_PREROLL_MS"] = str(cfg.vad_preroll_ms)
+        env["DVC_VOSK_MODEL_PATH"] = vosk_model_path
+
+    # None means "unset": those keys are popped, everything else goes in one update.
+    os.environ.update({k: str(v) for k, v in env.items() if v is not None})
+    for k in [k for k, v in env.items() if v is None]:
+        os.environ.pop(k, None)
 
     os.environ.setdefault("DVC_DEBUG", "0")
     os.environ.setdefault("DVC_SAVE_WAV", "0")
-    os.environ["DVC_INMEM_AUDIO"] = "1" if bool(cfg.inmem_audio) else "0"
-
-    open_phrases = cfg.open_phrases or cfg.open_phrases
-    os.environ["DVC_OPEN_PHRASES"] = str(open_phrases)
-    os.environ["DVC_OPEN_PHRASES"] = str(open_phrases)
-    os.environ["DVC_OPEN_SCORE_THR"] = str(cfg.open_score_thr)
-    os.environ["DVC_OPEN_MAX_REC_SEC"] = str(cfg.open_max_rec_sec)
-    os.environ["DVC_OPEN_VAD_END_SIL_MS"] = str(cfg.open_vad_end_sil_ms)
-
-    os.environ["DVC_CLOSE_PHRASES"] = str(cfg.close_phrases)
-    os.environ["DVC_CLOSE_SCORE_THR"] = str(cfg.close_score_thr)
-
-    os.environ["DVC_OPEN_ENABLE_OPEN"] = "1" if bool(cfg.open_enable_open) else "0"
-    os.environ["DVC_CLOSE_ENABLE_VOICE"] = "1" if bool(cfg.close_enable_voice) else "0"
-
-    os.environ["DVC_SHOUTS_ENABLE"] = "1" if bool(cfg.shouts_enable) else "0"
-    os.environ["DVC_SHOUTS_BACKEND"] = str(asr["shouts_backend"])
-    os.environ["DVC_SHOUTS_LANG"] = str(asr["shouts_lang"])
-    os.environ["DVC_SHOUTS_VOSK_MODEL"] = str(asr["shouts_vosk_model_name"])
-    # Shouts Vosk model path is resolved lazily at runtime on CFG|SHOUTS|1.
-    os.environ.pop("DVC_SHOUTS_VOSK_MODEL_PATH", None)
 
 
 def _run() -> None:
@@ -293,10 +332,12 @@ def _run() -> None:
             input()
             sys.exit(1)
 
-        if _relaunch_with_portable_python():
+    ini = _find_ini()
+
+    if not IS_FROZEN:
+        if _relaunch_with_portable_python(ini):
             sys.exit(0)
 
-    ini = _find_ini()
     cfg = load_config(ini) if ini else ServerConfig()
 
     asr = _resolve_asr_settings(cfg)
@@ -316,6 +357,7 @@ def _run() -> None:
 
     _check_runtime_deps(asr["asr_engine"], asr["shouts_backend"])
 
+    # CPU and Vosk never touch the probe; for whisper ctranslate2 is already loaded by the deps check.
     if asr["asr_engine"] == "whisper" and backend_eff in ("gpu", "auto"):
         ok = _gpu_available_for_whisper()
         if not ok:
@@ -335,7 +377,7 @@ def _run() -> None:
 
 
 def _handle_audio_device_check() -> bool:
-    if not any(a.lower() == "--check-audio-device" for a in sys.argv):
+    if not _HAS_CHECK_AUDIO:
         return False
 
     try:
@@ -389,6 +431,7 @@ def _check_runtime_deps(asr_engine: str, shouts_backend: str) -> None:
     _require_import("numpy")
     _require_import("sounddevice")
     _require_import("keyboard")
+    _require_import("onnxruntime")
     _require_import("win32pipe", hint=PYWIN32_HINT)
     _require_import("win32file", hint=PYWIN32_HINT)
     _require_import("pywintypes", hint=PYWIN32_HINT)
@@ -419,22 +462,38 @@ def _ctranslate2_cuda_available() -> bool:
 def _gpu_available_for_whisper() -> bool:
     return _ctranslate2_cuda_available()
 
-def _relaunch_with_portable_python():
+def _relaunch_with_portable_python(ini: Path | None = None):
     if IS_FROZEN:
         return False
     if Path(sys.executable).resolve() != PY_EXE.resolve():
+        import subprocess
+
         print(f"[BOOT] relaunching with portable python: {PY_EXE}", flush=True)
         cmd = [str(PY_EXE), str(Path(__file__).resolve()), *sys.argv[1:]]
+        if ini is not None and _ini_from_argv(sys.argv) is None:
+            # Hand the resolved INI to the child so it skips discovery.
+            cmd += ["--ini", str(ini)]
         subprocess.Popen(cmd, cwd=str(RUNTIME_DIR), env=os.environ.copy())
         return True
     return False
 
-def _argv_get(name: str) -> str | None:
-    argv = [a.strip() for a in sys.argv]
+def _parse_argv(argv: list[str]) -> dict[str, str]:
+    # "--name value" pairs, first occurrence wins; any following arg is the value.
+    argv = [a.strip() for a in argv]
+    parsed: dict[str, str] = {}
     for i in range(len(argv) - 1):
-        if argv[i].lower() == f"--{name.lower()}":
-            return argv[i + 1]
-    return None
+        key = argv[i].lower()
+        if key.startswith("--"):
+            parsed.setdefault(key[2:], argv[i + 1])
+    return parsed
+
+
+_ARGV_MAP = _parse_argv(sys.argv)
+_HAS_CHECK_AUDIO = any(a.strip().lower() == "--check-audio-device" for a in sys.argv)
+
+
+def _argv_get(name: str) -> str | None:
+    return _ARGV_MAP.get(name.lower())
 
 def _print_ini_cfg(ini_path: Path | None, cfg, backend_req: str, backend_eff: str, cuda: str, cuda_specified: bool):
     ini_str = str(ini_path) if ini_path else "(none)"
@@ -452,7 +511,6 @@ def _print_ini_cfg(ini_path: Path | None, cfg, backend_req: str, backend_eff: st
         if str(cfg.whisper_model).strip():
             parts.append(f"Whisper.Model={cfg.whisper_model}")
         parts.append(f"Whisper.BeamSize={cfg.whisper_beam}")
-        parts.append(f"Whisper.InMemAudio={int(bool(cfg.inmem_audio))}")
     elif cfg.asr_engine == "vosk":
         if str(cfg.vosk_model).strip():
             parts.append(f"Vosk.Model={cfg.vosk_model}")
@@ -483,6 +541,8 @@ if __name__ == "__main__":
         _run()
 
     except Exception:
+        import traceback
+
         log_error(traceback.format_exc())
         log_error("[Server crashed] Press Enter to exit...")
         try:
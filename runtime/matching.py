@@ -1,9 +1,13 @@
 from __future__ import annotations
 
+import heapq
 import json
 import os
 import re
+import sys
 import unicodedata
+from dataclasses import dataclass
+from functools import lru_cache
 
 from config import ServerConfig
 
@@ -12,16 +16,32 @@ def _env_str(key: str, default: str) -> str:
     return os.environ.get(key, default).strip()
 
 
+# key -> (raw env value, default, parsed); re-parse only when either input changes.
+_ENV_PARSED: dict[str, tuple] = {}
+
+
 def _env_float(key: str, default: float) -> float:
+    raw = os.environ.get(key)
+    hit = _ENV_PARSED.get(key)
+    if hit is not None and hit[0] == raw and hit[1] == default:
+        return hit[2]
     try:
-        return float(os.environ.get(key, str(default)).strip())
+        value = float((str(default) if raw is None else raw).strip())
     except Exception:
-        return default
+        value = default
+    _ENV_PARSED[key] = (raw, default, value)
+    return value
 
 
 def _env_bool(key: str, default: bool) -> bool:
-    v = os.environ.get(key, "1" if default else "0").strip().lower()
-    return v in ("1", "true", "yes", "on")
+    raw = os.environ.get(key)
+    hit = _ENV_PARSED.get(key)
+    if hit is not None and hit[0] == raw and hit[1] == default:
+        return hit[2]
+    v = ("1" if default else "0") if raw is None else raw
+    value = v.strip().lower() in ("1", "true", "yes", "on")
+    _ENV_PARSED[key] = (raw, default, value)
+    return value
 
 _CFG = None
 
@@ -71,49 +91,77 @@ def _min_diff() -> float:
     return _env_float("DVC_MIN_DIFF", float(_cfg().min_diff))
 
 
+_PAREN_RE = re.compile(r"\([^)]*\)")
+_PUNCT_TABLE = str.maketrans({c: " " for c in "?!.:,;\"'()[]{}<>/\\-"})
+
+
+# ASR text, phrases and dialogue options repeat heavily between calls; sized so a
+# modded favorites list (thousands of item names) still fits alongside them.
+@lru_cache(maxsize=16384)
 def normalize(text: str) -> str:
-    s = unicodedata.normalize("NFKC", text or "")
+    s = text or ""
+    # NFKC leaves pure ASCII untouched; skip it for the common English case.
+    if not s.isascii():
+        s = unicodedata.normalize("NFKC", s)
     s = s.lower()
-    s = re.sub(r"\([^)]*\)", " ", s)
-    s = re.sub(r"[?\!\.:,;\"'\(\)\[\]\{\}<>/\\-]", " ", s)
-    s = re.sub(r"\s+", " ", s).strip()
-    return s
+    s = _PAREN_RE.sub(" ", s)
+    s = s.translate(_PUNCT_TABLE)
+    # split() with no separator collapses any whitespace run and trims both ends.
+    return " ".join(s.split())
 
 
-def tokens(text: str) -> list[str]:
-    s = normalize(text)
-    return [t for t in s.split(" ") if t]
+@lru_cache(maxsize=4096)
+def tokens(text: str) -> tuple[str, ...]:
+    # Cached and shared between callers: a tuple so nobody can mutate it.
+    return tuple(normalize(text).split())
 
 
-def _dialogue_score(asr_text: str, option: str) -> tuple[float, int]:
-    r = set(tokens(asr_text))
-    o = set(tokens(option))
-    overlap = len(r & o)
-    score = overlap / max(1, len(r))
-    return score, overlap
+@lru_cache(maxsize=256)
+def _token_set(text: str) -> frozenset[str]:
+    # Ranking and best-option lookups score the same ASR text back to back.
+    return frozenset(tokens(text))
 
 
-def _best_match_scores(text: str, options: list[str]) -> list[tuple[float, int, str, int]]:
-    scores: list[tuple[float, int, str, int]] = []
-    for i, opt in enumerate(options):
-        sc, overlap = _dialogue_score(text, opt)
-        scores.append((sc, i, opt, overlap))
-    scores.sort(reverse=True, key=lambda x: x[0])
-    return scores
+class DialogueIndex:
+    """Option token sets built once per dialogue list and reused for every ASR hypothesis."""
 
+    __slots__ = ("options", "token_sets")
 
-def get_open_phrases_list() -> list[str]:
-    s = _open_phrases_str()
-    phrases: list[str] = []
-    for p in str(s).split(","):
-        n = normalize(p)
-        if n:
-            phrases.append(n)
-    return phrases
+    def __init__(self, options: list[str]):
+        self.options = list(options)
+        self.token_sets = [frozenset(tokens(o)) for o in self.options]
 
 
-def get_close_phrases_list() -> list[str]:
-    s = _close_phrases_str()
+@lru_cache(maxsize=16)
+def _dialogue_index(options: tuple[str, ...]) -> DialogueIndex:
+    return DialogueIndex(options)
+
+
+def dialogue_index(options: list[str]) -> DialogueIndex:
+    # Menus are reopened with identical options; key the shared index on their contents.
+    return _dialogue_index(tuple(options))
+
+
+def _score_key(entry: tuple) -> float:
+    return entry[0]
+
+
+def _iter_match_scores(text: str, idx: DialogueIndex):
+    # The ASR side is the same for every option: tokenize it once.
+    r = _token_set(text)
+    denom = max(1, len(r))
+    for i, (opt, o) in enumerate(zip(idx.options, idx.token_sets)):
+        overlap = len(r & o)
+        yield overlap / denom, i, opt, overlap
+
+
+def _best_match_scores(text: str, idx: DialogueIndex) -> list[tuple[float, int, str, int]]:
+    scores = list(_iter_match_scores(text, idx))
+    scores.sort(reverse=True, key=_score_key)
+    return scores
+
+
+def _parse_phrases(s: str) -> list[str]:
     phrases: list[str] = []
     for p in str(s).split(","):
         n = normalize(p)
@@ -122,12 +170,84 @@ def get_close_phrases_list() -> list[str]:
     return phrases
 
 
-def _evaluate_phrase_match(ntext: str, text_tokens: set[str], phrase: str) -> tuple[bool, float, str]:
+@lru_cache(maxsize=1024)
+def _phrase_entry(phrase: str) -> tuple[str, tuple[str, ...], frozenset[str]]:
+    # Open/close phrases are few and reused on every match: tokenize them once,
+    # interned, with a ready-made set for the intersection.
     pnorm = normalize(phrase)
-    if not pnorm:
-        return False, 0.0, ""
+    ptokens = tuple(sys.intern(t) for t in pnorm.split())
+    return pnorm, ptokens, frozenset(ptokens)
+
 
-    ptokens = [t for t in pnorm.split(" ") if t]
+# Parsed phrase lists keyed by the raw comma-separated string they came from,
+# alongside the (pnorm, tokens, token set) entries the matchers consume.
+_OPEN_CACHE = {"raw": None, "list": [], "entries": [], "json": None}
+_CLOSE_CACHE = {"raw": None, "list": [], "entries": [], "json": None}
+
+
+def _cached_phrases(cache: dict, raw: str) -> dict:
+    if cache["raw"] != raw:
+        phrases = _parse_phrases(raw)
+        cache["list"] = phrases
+        cache["entries"] = [_phrase_entry(p) for p in phrases]
+        cache["json"] = None
+        cache["raw"] = raw
+    return cache
+
+
+def get_open_phrases_list() -> list[str]:
+    # Shared cached list: callers must not mutate it.
+    return _cached_phrases(_OPEN_CACHE, _open_phrases_str())["list"]
+
+
+def get_close_phrases_list() -> list[str]:
+    return _cached_phrases(_CLOSE_CACHE, _close_phrases_str())["list"]
+
+
+@dataclass(slots=True)
+class MatchCfg:
+    open_phrases: list[tuple]
+    close_phrases: list[tuple]
+    open_thr: float
+    close_thr: float
+    min_score: float
+    min_diff: float
+    close_enable_voice: bool
+
+
+_MATCH_ENV_KEYS = (
+    "DVC_OPEN_PHRASES",
+    "DVC_OPEN_SCORE_THR",
+    "DVC_CLOSE_PHRASES",
+    "DVC_CLOSE_SCORE_THR",
+    "DVC_CLOSE_ENABLE_VOICE",
+    "DVC_MIN_SCORE",
+    "DVC_MIN_DIFF",
+)
+_MATCH_CFG: tuple | None = None
+
+
+def get_match_cfg() -> MatchCfg:
+    # One snapshot of every matching knob; rebuilt only when the cfg or a DVC_* value changes.
+    global _MATCH_CFG
+    key = (id(_CFG), *map(os.environ.get, _MATCH_ENV_KEYS))
+    if _MATCH_CFG is not None and _MATCH_CFG[0] == key:
+        return _MATCH_CFG[1]
+    snap = MatchCfg(
+        open_phrases=_cached_phrases(_OPEN_CACHE, _open_phrases_str())["entries"],
+        close_phrases=_cached_phrases(_CLOSE_CACHE, _close_phrases_str())["entries"],
+        open_thr=_open_score_thr(),
+        close_thr=_close_score_thr(),
+        min_score=_min_score(),
+        min_diff=_min_diff(),
+        close_enable_voice=_close_enable_voice(),
+    )
+    _MATCH_CFG = (key, snap)
+    return snap
+
+
+def _evaluate_phrase_match(ntext: str, text_tokens: set[str], entry: tuple) -> tuple[bool, float, str]:
+    pnorm, ptokens, pset = entry
     if not ptokens:
         return False, 0.0, ""
 
@@ -135,14 +255,18 @@ def _evaluate_phrase_match(ntext: str, text_tokens: set[str], phrase: str) -> tu
         hit = (ptokens[0] in text_tokens)
         return hit, (1.0 if hit else 0.0), pnorm
 
+    # No shared token: skip the substring scan, it could only hit across partial words.
+    overlap_cnt = len(text_tokens & pset)
+    if not overlap_cnt:
+        return False, 0.0, pnorm
+
     if pnorm in ntext:
         return True, 1.0, pnorm
 
-    overlap = len(text_tokens & set(ptokens)) / len(ptokens)
-    return False, overlap, pnorm
+    return False, overlap_cnt / len(ptokens), pnorm
 
 
-def _match_phrase_by_overlap(text: str, phrase_list: list[str], threshold: float) -> tuple[bool, float, str]:
+def _match_phrase_by_overlap(text: str, entries: list[tuple], threshold: float) -> tuple[bool, float, str]:
     ntext = normalize(text)
     if not ntext:
         return False, 0.0, ""
@@ -154,8 +278,8 @@ def _match_phrase_by_overlap(text: str, phrase_list: list[str], threshold: float
     best_score = 0.0
     best_phrase = ""
 
-    for phrase in phrase_list:
-        matched, score, pnorm = _evaluate_phrase_match(ntext, text_tokens, phrase)
+    for entry in entries:
+        matched, score, pnorm = _evaluate_phrase_match(ntext, text_tokens, entry)
         if not pnorm:
             continue
 
@@ -170,14 +294,15 @@ def _match_phrase_by_overlap(text: str, phrase_list: list[str], threshold: float
 
 
 def match_open_phrase(text: str, open_list: list[str]) -> tuple[bool, float, str]:
-    return _match_phrase_by_overlap(text, open_list, _open_score_thr())
+    return _match_phrase_by_overlap(text, [_phrase_entry(p) for p in open_list], _open_score_thr())
 
 
-def match_open(text: str) -> tuple[bool, float, str]:
-    return match_open_phrase(text, get_open_phrases_list())
+def match_open(text: str, mcfg: MatchCfg | None = None) -> tuple[bool, float, str]:
+    mcfg = mcfg or get_match_cfg()
+    return _match_phrase_by_overlap(text, mcfg.open_phrases, mcfg.open_thr)
 
 
-def match_close_phrase(text: str, close_list: list[str]) -> tuple[bool, float, str]:
+def _match_close_entries(text: str, entries: list[tuple], threshold: float) -> tuple[bool, float, str]:
     ntext = normalize(text)
     if not ntext:
         return False, 0.0, ""
@@ -186,16 +311,10 @@ def match_close_phrase(text: str, close_list: list[str]) -> tuple[bool, float, s
     if not text_tokens:
         return False, 0.0, ""
 
-    threshold = _close_score_thr()
     best_score = 0.0
     best_phrase = ""
 
-    for phrase in close_list:
-        pnorm = normalize(phrase)
-        if not pnorm:
-            continue
-
-        ptokens = [t for t in pnorm.split(" ") if t]
+    for pnorm, ptokens, pset in entries:
         if not ptokens:
             continue
 
@@ -204,10 +323,13 @@ def match_close_phrase(text: str, close_list: list[str]) -> tuple[bool, float, s
                 return True, 1.0, pnorm
             continue
 
+        overlap_cnt = len(text_tokens & pset)
+        if not overlap_cnt:
+            continue
+
         if pnorm in ntext:
             return True, 1.0, pnorm
 
-        overlap_cnt = len(text_tokens & set(ptokens))
         score = overlap_cnt / len(ptokens)
 
         if overlap_cnt >= 2 and score >= threshold:
@@ -220,72 +342,127 @@ def match_close_phrase(text: str, close_list: list[str]) -> tuple[bool, float, s
     return False, best_score, best_phrase
 
 
-def match_close(text: str) -> tuple[bool, float, str]:
-    return match_close_phrase(text, get_close_phrases_list())
+def match_close_phrase(text: str, close_list: list[str]) -> tuple[bool, float, str]:
+    return _match_close_entries(text, [_phrase_entry(p) for p in close_list], _close_score_thr())
+
+
+def match_close(text: str, mcfg: MatchCfg | None = None) -> tuple[bool, float, str]:
+    mcfg = mcfg or get_match_cfg()
+    return _match_close_entries(text, mcfg.close_phrases, mcfg.close_thr)
 
 
-def is_close(text: str) -> bool:
-    if not _close_enable_voice():
+def is_close(text: str, mcfg: MatchCfg | None = None) -> bool:
+    mcfg = mcfg or get_match_cfg()
+    if not mcfg.close_enable_voice:
         return False
-    return match_close(text)[0]
+    return match_close(text, mcfg)[0]
 
 
-def best_dialogue_option(text: str, options: list[str]) -> tuple[int, float]:
-    if not options:
-        return -1, 0.0
+def _accept_best(sc1: float, sc2: float, overlap0: int, mcfg: MatchCfg) -> bool:
+    # The leader must be a confident match and clear the runner-up by the margin.
+    return (overlap0 >= 2 or sc1 >= mcfg.min_score) and (sc1 - sc2) >= mcfg.min_diff
 
-    scores = _best_match_scores(text, options)
-    if not scores:
-        return -1, 0.0
 
-    sc1, idx0, _opt0, overlap0 = scores[0]
-    sc2 = scores[1][0] if len(scores) > 1 else 0.0
-    diff = sc1 - sc2
+def best_dialogue_option_indexed(text: str, idx: DialogueIndex, mcfg: MatchCfg | None = None) -> tuple[int, float]:
+    _top, idx0, sc1 = top_k_dialogue_options_indexed(text, idx, 1, mcfg)
+    return idx0, sc1
 
-    if (overlap0 >= 2 or sc1 >= _min_score()) and diff >= _min_diff():
-        return idx0, float(sc1)
 
-    return -1, 0.0
+def best_dialogue_option(text: str, options: list[str], mcfg: MatchCfg | None = None) -> tuple[int, float]:
+    if not options:
+        return -1, 0.0
+    return best_dialogue_option_indexed(text, dialogue_index(options), mcfg)
+
+
+def rank_dialogue_options_indexed(text: str, idx: DialogueIndex) -> list[tuple[float, int, str]]:
+    return [(sc, i, opt) for sc, i, opt, _overlap in _best_match_scores(text, idx)]
 
 
 def rank_dialogue_options(text: str, options: list[str]) -> list[tuple[float, int, str]]:
-    return [(sc, idx, opt) for sc, idx, opt, _overlap in _best_match_scores(text, options)]
+    return rank_dialogue_options_indexed(text, dialogue_index(options))
 
 
-def _append_unique_phrase(phrases: list[str], seen: set[str], parts: list[str]) -> None:
-    phrase = " ".join(parts)
-    if phrase and phrase not in seen:
-        seen.add(phrase)
-        phrases.append(phrase)
+def top_k_dialogue_options_indexed(
+    text: str, idx: DialogueIndex, k: int = 3, mcfg: MatchCfg | None = None
+) -> tuple[list[tuple[float, int, str]], int, float]:
+    """The k best (score, index, option) plus the accepted best index and score, in one scoring pass."""
+    if not idx.options:
+        return [], -1, 0.0
 
+    # nlargest is stable like the full sort; keep two for the margin check.
+    full = heapq.nlargest(max(k, 2), _iter_match_scores(text, idx), key=_score_key)
+    top = [(sc, i, opt) for sc, i, opt, _overlap in full[:k]]
+    sc1, idx0, _opt, overlap0 = full[0]
+    sc2 = full[1][0] if len(full) > 1 else 0.0
 
-def _tail_tokens(tok: list[str], size: int) -> list[str] | None:
-    if len(tok) < size:
-        return None
-    return tok[-size:]
+    if _accept_best(sc1, sc2, overlap0, mcfg or get_match_cfg()):
+        return top, idx0, float(sc1)
+    return top, -1, 0.0
 
 
 def build_dialog_grammar_phrases(options: list[str]) -> list[str]:
+    # Each option contributes its full phrase plus its 2- and 3-token tails.
     phrases: list[str] = []
     seen: set[str] = set()
     for opt in options:
         if not isinstance(opt, str):
             continue
         tok = tokens(opt)
-        if not tok:
+        n = len(tok)
+        if not n:
             continue
 
-        _append_unique_phrase(phrases, seen, tok)
-        for size in (2, 3):
-            tail = _tail_tokens(tok, size)
-            if tail is not None:
-                _append_unique_phrase(phrases, seen, tail)
+        cands = [" ".join(tok)]
+        if n >= 2:
+            cands.append(" ".join(tok[-2:]))
+        if n >= 3:
+            cands.append(" ".join(tok[-3:]))
+        for p in cands:
+            if p not in seen:
+                seen.add(p)
+                phrases.append(p)
 
     return phrases
 
 
-def dialog_grammar_json(options: list[str]) -> str | None:
+# Compact separators: Vosk does not need the default ", " spacing.
+_GRAMMAR_ENCODER = json.JSONEncoder(ensure_ascii=False, check_circular=False, separators=(",", ":"))
+
+# Optional: orjson emits the same compact, non-ASCII-escaped output faster.
+try:
+    import orjson as _orjson
+except ImportError:
+    _orjson = None
+
+
+def grammar_json(phrases) -> str:
+    if _orjson is not None:
+        return _orjson.dumps(list(phrases)).decode("utf-8")
+    return _GRAMMAR_ENCODER.encode(list(phrases))
+
+
+@lru_cache(maxsize=16)
+def _dialog_grammar(options: tuple[str, ...]) -> tuple[tuple[str, ...], str | None]:
+    # The same dialogue menu is reopened/updated repeatedly; build its grammar once.
     phrases = build_dialog_grammar_phrases(options)
+    return tuple(phrases), (grammar_json(phrases) if phrases else None)
+
+
+def dialog_grammar(options: list[str]) -> tuple[list[str], str | None]:
+    phrases, grammar = _dialog_grammar(tuple(options))
+    return list(phrases), grammar
+
+
+def dialog_grammar_json(options: list[str]) -> str | None:
+    return _dialog_grammar(tuple(options))[1]
+
+
+def close_grammar() -> tuple[list[str], str | None]:
+    # Shared cached list: callers must not mutate it.
+    cache = _cached_phrases(_CLOSE_CACHE, _close_phrases_str())
+    phrases = cache["list"]
     if not phrases:
-        return None
-    return json.dumps(phrases, ensure_ascii=False)
\ No newline at end of file
+        return [], None
+    if cache["json"] is None:
+        cache["json"] = grammar_json(phrases)
+    return phrases, cache["json"]
\ No newline at end of file
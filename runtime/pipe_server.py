@@ -1,24 +1,23 @@
+import atexit
 import json
 import os
+import queue
 import threading
 import time
-import wave
 import sys
 from typing import Optional, List
-from itertools import cycle
+from itertools import chain
 from pathlib import Path
 from datetime import datetime
+from functools import lru_cache
+from types import MappingProxyType
 
 import win32pipe, win32file, pywintypes
 
-from rich.console import Console
-from rich.live import Live
-from rich.text import Text
-
-from audio_pipeline import AudioPipeline
+from audio_pipeline import AudioPipeline, write_wav_int16
 from recognition import Recognizer
 import matching
-from config import ServerConfig
+from config import ServerConfig, dvc_cache_root
 from voice_rules import VoiceState
 from vosk_models import ensure_vosk_model
 from log_utils import setup_timestamped_print, log_warn, log_error, log_success
@@ -29,6 +28,8 @@ setup_timestamped_print()
 
 # ===== PIPE =====
 PIPE_NAME = r"\\.\pipe\DVC_voice_local"
+_READ_MIN = 4096
+_READ_MAX = 65536
 
 CMD_OPEN_PREFIX = "OPEN|"
 CMD_CLOSE = "CLOSE"
@@ -37,19 +38,20 @@ CMD_LISTEN_OFF = "LISTEN|0"
 CMD_LISTEN_SHOUTS_ON = "LISTEN|SHOUTS|1"
 CMD_LISTEN_SHOUTS_OFF = "LISTEN|SHOUTS|0"
 CMD_LANG_PREFIX = "LANG|"
+CMD_FAV_BEGIN = "FAV|BEGIN"
+
+# Lines this short are interned so dict probes against the command constants hit by identity.
+_INTERN_MAX = 24
 
 SR = 16000
 
-_WAIT_CONSOLE = Console(file=sys.__stdout__, force_terminal=True)
 _WAIT_BASE = "Waiting for client"
-_WAIT_DOTS = cycle(["", ".", "..", "..."])
-_WAIT_TS: str | None = None
+_WAIT_DOTS = ("", ".", "..", "...")
 
 
-def _render_waiting() -> Text:
-    if _WAIT_TS:
-        return Text(f"[{_WAIT_TS}] {_WAIT_BASE}{next(_WAIT_DOTS)}")
-    return Text(f"{_WAIT_BASE}{next(_WAIT_DOTS)}")
+def _wait_frames(ts: str) -> tuple[str, ...]:
+    # trailing spaces erase the longer dots of the previous frame
+    return tuple(f"\r[{ts}] {_WAIT_BASE}{dots}   " for dots in _WAIT_DOTS)
 
 
 def _connect_with_wait(pipe) -> None:
@@ -65,21 +67,24 @@ def _connect_with_wait(pipe) -> None:
             done.set()
 
     thread = threading.Thread(target=_connect, daemon=True)
-    # Capture a single timestamp to print once on the left of the live line
-    global _WAIT_TS
-    _WAIT_TS = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+    # Timestamp is captured once, so all four frames are built up front
+    frames = _wait_frames(datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3])
     thread.start()
 
-    with Live(_render_waiting(), refresh_per_second=10, console=_WAIT_CONSOLE) as live:
-        while not done.is_set():
-            time.sleep(0.5)
-            live.update(_render_waiting())
+    # Block on the event itself: the loop wakes the moment the client connects,
+    # otherwise every 500 ms to advance the dots.
+    out = sys.__stdout__
+    i = 0
+    out.write(frames[0])
+    out.flush()
+    while not done.wait(0.5):
+        i = (i + 1) & 3
+        out.write(frames[i])
+        out.flush()
 
     thread.join()
     if errors:
         raise errors[0]
-    # Clear the timestamp so it won't appear for subsequent waits
-    _WAIT_TS = None
 
 
 def _env_str(key: str, default: str) -> str:
@@ -102,58 +107,59 @@ def _env_float(key: str, default: float) -> float:
         return default
 
 
+_LANG_MAP = MappingProxyType({
+    "en": ("en", "english"),
+    "english": ("en", "english"),
+    "ru": ("ru", "russian"),
+    "russian": ("ru", "russian"),
+    "fr": ("fr", "french"),
+    "french": ("fr", "french"),
+    "it": ("it", "italian"),
+    "italian": ("it", "italian"),
+    "de": ("de", "german"),
+    "german": ("de", "german"),
+    "deutsch": ("de", "german"),
+    "es": ("es", "spanish"),
+    "spanish": ("es", "spanish"),
+    "espanol": ("es", "spanish"),
+    "pl": ("pl", "polish"),
+    "polish": ("pl", "polish"),
+    "polski": ("pl", "polish"),
+    "ja": ("ja", "japanese"),
+    "japanese": ("ja", "japanese"),
+    "cn": ("cn", "traditional_chinese"),
+    "zh": ("cn", "traditional_chinese"),
+    "zhcn": ("cn", "traditional_chinese"),
+    "zhhant": ("cn", "traditional_chinese"),
+    "chinese": ("cn", "traditional_chinese"),
+    "chinesetraditional": ("cn", "traditional_chinese"),
+    "traditionalchinese": ("cn", "traditional_chinese"),
+})
+
+_VOSK_MODELS = MappingProxyType({
+    "en": "vosk-model-small-en-us-0.15",
+    "fr": "vosk-model-small-fr-0.22",
+    "it": "vosk-model-small-it-0.22",
+    "de": "vosk-model-small-de-0.15",
+    "es": "vosk-model-small-es-0.42",
+    "pl": "vosk-model-small-pl-0.22",
+    "cn": "vosk-model-small-cn-0.22",
+    "ru": "vosk-model-small-ru-0.22",
+    "ja": "vosk-model-small-ja-0.22",
+})
+
+
 def _normalize_game_language(raw: str) -> tuple[str, str]:
     value = str(raw or "").strip().lower()
     if not value:
         return "", ""
 
     norm = "".join(ch for ch in value if ch.isalnum())
-
-    mapping = {
-        "en": ("en", "english"),
-        "english": ("en", "english"),
-        "ru": ("ru", "russian"),
-        "russian": ("ru", "russian"),
-        "fr": ("fr", "french"),
-        "french": ("fr", "french"),
-        "it": ("it", "italian"),
-        "italian": ("it", "italian"),
-        "de": ("de", "german"),
-        "german": ("de", "german"),
-        "deutsch": ("de", "german"),
-        "es": ("es", "spanish"),
-        "spanish": ("es", "spanish"),
-        "espanol": ("es", "spanish"),
-        "pl": ("pl", "polish"),
-        "polish": ("pl", "polish"),
-        "polski": ("pl", "polish"),
-        "ja": ("ja", "japanese"),
-        "japanese": ("ja", "japanese"),
-        "cn": ("cn", "traditional_chinese"),
-        "zh": ("cn", "traditional_chinese"),
-        "zhcn": ("cn", "traditional_chinese"),
-        "zhhant": ("cn", "traditional_chinese"),
-        "chinese": ("cn", "traditional_chinese"),
-        "chinesetraditional": ("cn", "traditional_chinese"),
-        "traditionalchinese": ("cn", "traditional_chinese"),
-    }
-
-    return mapping.get(norm, ("", ""))
+    return _LANG_MAP.get(norm, ("", ""))
 
 
 def _vosk_model_for_lang(lang_key: str) -> str:
-    models = {
-        "en": "vosk-model-small-en-us-0.15",
-        "fr": "vosk-model-small-fr-0.22",
-        "it": "vosk-model-small-it-0.22",
-        "de": "vosk-model-small-de-0.15",
-        "es": "vosk-model-small-es-0.42",
-        "pl": "vosk-model-small-pl-0.22",
-        "cn": "vosk-model-small-cn-0.22",
-        "ru": "vosk-model-small-ru-0.22",
-        "ja": "vosk-model-small-ja-0.22",
-    }
-    return models.get(lang_key, models["en"])
+    return _VOSK_MODELS.get(lang_key, _VOSK_MODELS["en"])
 
 
 def _shouts_lang_for_game(lang_key: str) -> str:
@@ -178,15 +184,18 @@ def _await_game_language(pipe, reader: "PipeReader") -> tuple[str, str, list[str
         pending.append(line)
 
 
-def _apply_language_to_cfg(cfg: ServerConfig, lang_key: str) -> None:
-    vosk_override = _env_str("DVC_VOSK_MODEL", str(getattr(cfg, "vosk_model", ""))).strip()
-    shouts_model_override = _env_str(
-        "DVC_SHOUTS_VOSK_MODEL", str(getattr(cfg, "shouts_vosk_model", ""))
-    ).strip()
-    shouts_lang_override = _env_str(
-        "DVC_SHOUTS_LANG", str(getattr(cfg, "shouts_language", ""))
-    ).strip()
-    asr_lang_override = _env_str("DVC_ASR_LANG", "").strip()
+def _language_overrides(cfg: ServerConfig) -> tuple[str, str, str, str]:
+    """Snapshot env overrides (vosk model, shouts model, shouts lang, asr lang) once per process."""
+    return (
+        _env_str("DVC_VOSK_MODEL", str(getattr(cfg, "vosk_model", ""))).strip(),
+        _env_str("DVC_SHOUTS_VOSK_MODEL", str(getattr(cfg, "shouts_vosk_model", ""))).strip(),
+        _env_str("DVC_SHOUTS_LANG", str(getattr(cfg, "shouts_language", ""))).strip(),
+        _env_str("DVC_ASR_LANG", "").strip(),
+    )
+
+
+def _apply_language_to_cfg(cfg: ServerConfig, lang_key: str, overrides: tuple[str, str, str, str]) -> None:
+    vosk_override, shouts_model_override, shouts_lang_override, asr_lang_override = overrides
 
     cfg.vosk_model = vosk_override or _vosk_model_for_lang(lang_key)
     cfg.shouts_vosk_model = shouts_model_override or _vosk_model_for_lang("ru" if lang_key == "ru" else "en")
@@ -195,63 +204,90 @@ def _apply_language_to_cfg(cfg: ServerConfig, lang_key: str) -> None:
 
 
 def _ensure_main_vosk_model(cfg: ServerConfig) -> str:
-    cache_root_env = os.environ.get("DVC_CACHE_DIR", "").strip()
-    cache_root = Path(cache_root_env).expanduser().resolve() if cache_root_env else (
-        Path(sys.executable).resolve().parent if bool(getattr(sys, "frozen", False)) else Path(__file__).resolve().parent
-    )
-    cache_dir = (cache_root / "caches" / "vosk").resolve()
+    cache_dir = (dvc_cache_root() / "caches" / "vosk").resolve()
     model_dir = ensure_vosk_model(cfg.vosk_model, cache_dir)
     os.environ["DVC_VOSK_MODEL_PATH"] = str(model_dir)
     return str(model_dir)
 
 
-def _save_debug_wav(kind: str, pcm16, rec: Recognizer) -> str | None:
+# Debug WAVs are written off the capture thread: (kind, out_path, rel_path, pcm16) or None to stop.
+# Bounded so a slow disk cannot pile up captures in memory; overflow is dropped.
+_WAV_QUEUE: "queue.Queue[tuple | None]" = queue.Queue(maxsize=8)
+_WAV_WRITER: threading.Thread | None = None
+_WAV_WRITER_LOCK = threading.Lock()
+
+
+def _wav_writer_loop() -> None:
+    while True:
+        job = _WAV_QUEUE.get()
+        if job is None:
+            return
+        kind, out_path, rel_path, pcm16 = job
+        try:
+            write_wav_int16(out_path, pcm16)
+            print(f"[WAV] save_wav=on record_saved={rel_path}", flush=True)
+        except Exception as e:
+            log_warn(f"[WAV][WARN] failed to save {kind} wav: {e}")
+
+
+def _stop_wav_writer() -> None:
+    """Drain pending WAV writes before the process exits."""
+    writer = _WAV_WRITER
+    if writer is None:
+        return
+    _WAV_QUEUE.put(None)
+    writer.join(timeout=5.0)
+
+
+def _submit_wav(job: tuple) -> bool:
+    global _WAV_WRITER
+    with _WAV_WRITER_LOCK:
+        if _WAV_WRITER is None:
+            _WAV_WRITER = threading.Thread(target=_wav_writer_loop, name="dvc-wav-writer", daemon=True)
+            _WAV_WRITER.start()
+            atexit.register(_stop_wav_writer)
     try:
-        if not bool(getattr(rec, "save_wav_enabled", False)):
-            return None
-        if pcm16 is None:
-            return None
-        if getattr(pcm16, "size", 0) == 0:
-            return None
+        _WAV_QUEUE.put_nowait(job)
+    except queue.Full:
+        return False
+    return True
 
-        cache_root_env = os.environ.get("DVC_CACHE_DIR", "").strip()
-        cache_root = Path(cache_root_env).expanduser().resolve() if cache_root_env else (
-            Path(sys.executable).resolve().parent if bool(getattr(sys, "frozen", False)) else Path(__file__).resolve().parent
-        )
+
+def _save_debug_wav(kind: str, pcm16, rec: Recognizer) -> str | None:
+    if not getattr(rec, "save_wav_enabled", False) or pcm16 is None or getattr(pcm16, "size", 0) == 0:
+        return None
+    try:
         rel_dir = str(getattr(rec, "wav_dir_rel", "caches/vad_caps") or "caches/vad_caps")
-        out_dir = (cache_root / rel_dir).resolve()
-        out_dir.mkdir(parents=True, exist_ok=True)
+        # resolved and created by the recognizer (init / set_save_wav_enabled)
+        out_dir = rec.wav_debug_dir
 
         ts = time.strftime("%Y%m%d_%H%M%S")
         ms = int(time.time() * 1000) % 1000
         safe_kind = (kind or "audio").strip().lower().replace(" ", "_")
         filename = f"{safe_kind}_{ts}_{ms:03d}.wav"
-        out_path = out_dir / filename
-
-        with wave.open(str(out_path), "wb") as wf:
-            wf.setnchannels(1)
-            wf.setsampwidth(2)
-            wf.setframerate(SR)
-            wf.writeframes(pcm16.tobytes())
 
         rel_dir_norm = rel_dir.strip("/\\")
         rel_path = f"{rel_dir_norm}/{filename}".replace("\\", "/")
-        print(f"[WAV] save_wav=on record_saved={rel_path}", flush=True)
+        if not _submit_wav((kind, out_dir / filename, rel_path, pcm16)):
+            log_warn(f"[WAV][WARN] writer busy, dropped {kind} wav")
+            return None
         return rel_path
     except Exception as e:
         log_warn(f"[WAV][WARN] failed to save {kind} wav: {e}")
         return None
 
 
+_SHOUT_ID_TRANS = str.maketrans({" ": "_", "-": "_"})
+
+
+@lru_cache(maxsize=None)
 def _normalize_shout_id(raw: str | None) -> str:
     if raw is None:
         return ""
-    out = str(raw).strip().upper()
-    out = out.replace(" ", "_")
-    out = out.replace("-", "_")
-    return out
+    return str(raw).strip().upper().translate(_SHOUT_ID_TRANS)
 
 
+@lru_cache(maxsize=1)
 def _load_shouts_map_names() -> dict[str, str]:
     try:
         runtime_dir = Path(sys.executable).resolve().parent if bool(getattr(sys, "frozen", False)) else Path(__file__).resolve().parent
@@ -273,22 +309,42 @@ def _load_shouts_map_names() -> dict[str, str]:
         return {}
 
 # ---------------- PIPE UTILS ----------------
+def _read_size(h) -> int:
+    """Size the next ReadFile to drain whatever the pipe already holds."""
+    try:
+        avail = int(win32pipe.PeekNamedPipe(h, 0)[1])
+    except Exception:
+        return _READ_MIN
+    return max(_READ_MIN, min(avail, _READ_MAX))
+
+
 class PipeReader:
     """Buffered line reader for named pipe with buffer visibility."""
 
-    def __init__(self):
-        self._buf = b""
+    def __init__(self, wake: Optional[threading.Event] = None):
+        self._buf = bytearray()
+        # signalled while bytes past the returned line remain buffered
+        self.wake = wake
 
     def read_line(self, h):
-        while b"\n" not in self._buf:
-            _, chunk = win32file.ReadFile(h, 4096)
-            self._buf += chunk
-        line, self._buf = self._buf.split(b"\n", 1)
+        buf = self._buf
+        idx = buf.find(b"\n")
+        while idx == -1:
+            start = len(buf)
+            _, chunk = win32file.ReadFile(h, _read_size(h))
+            buf.extend(chunk)
+            idx = buf.find(b"\n", start)
+        line = bytes(buf[:idx])
+        del buf[:idx + 1]
+        if buf and self.wake is not None:
+            self.wake.set()
+        if idx < _INTERN_MAX:
+            return sys.intern(line.decode("utf-8", errors="replace"))
         return line.decode("utf-8", errors="replace")
 
     def has_buffered_line(self) -> bool:
         """True if the internal buffer already contains a complete line."""
-        return b"\n" in self._buf
+        return self._buf.find(b"\n") != -1
 
 
 def make_reader():
@@ -300,109 +356,102 @@ def write_line(h, s):
     win32file.WriteFile(h, (s + "\n").encode("utf-8"))
 
 
+def _dbg_text(text: str) -> str:
+    return str(text).replace("\r", " ").replace("\n", " ").strip()
+
+
 def write_dbg_line(h, text: str):
-    msg = str(text).replace("\r", " ").replace("\n", " ").strip()
+    msg = _dbg_text(text)
     if not msg:
         return
     write_line(h, f"DBG|{msg}")
 
 
-def _peek_item_has_data(item) -> bool:
-    if isinstance(item, int):
-        return item > 0
-    if isinstance(item, (bytes, bytearray)):
-        return len(item) > 0
-    return False
+class PipeBatcher:
+    """Stages the pipe lines of one event and sends them with a single WriteFile."""
 
+    def __init__(self, h):
+        self.h = h
+        self._buf = bytearray()
 
-def _peek_tuple_common_shape_has_data(info: tuple) -> bool:
-    if len(info) < 2:
-        return False
-    data, avail = info[0], info[1]
-    if not isinstance(data, (bytes, bytearray)):
-        return False
-    avail_int = avail if isinstance(avail, int) else 0
-    return (avail_int > 0) or (len(data) > 0)
+    def write_line(self, s: str) -> None:
+        self._buf += (s + "\n").encode("utf-8")
 
+    def write_dbg_line(self, text: str) -> None:
+        msg = _dbg_text(text)
+        if msg:
+            self.write_line(f"DBG|{msg}")
+
+    def flush(self) -> None:
+        if not self._buf:
+            return
+        win32file.WriteFile(self.h, bytes(self._buf))
+        self._buf.clear()
 
-def _peek_result_has_data(info) -> bool:
-    if not isinstance(info, tuple):
-        return False
-    if _peek_tuple_common_shape_has_data(info):
-        return True
-    return any(_peek_item_has_data(item) for item in info)
 
 def pipe_has_data(h) -> bool:
     try:
-        return _peek_result_has_data(win32pipe.PeekNamedPipe(h, 1))
+        return win32pipe.PeekNamedPipe(h, 0)[1] > 0
     except Exception:
         return True
 
 def read_open_packet(read_line, pipe):
     options = []
+    append = options.append
     while True:
         l2 = read_line(pipe)
         if l2 == "END":
             break
         if l2.startswith("OPT|"):
-            options.append(l2[4:])
+            append(l2[4:])
     return options
 
 
 def _dialog_grammar(options: list[str]) -> tuple[list[str], str | None]:
-    phrases = matching.build_dialog_grammar_phrases(options)
-    if not phrases:
-        return [], None
-    return phrases, json.dumps(phrases, ensure_ascii=False)
+    return matching.dialog_grammar(options)
 
 
 def _close_grammar() -> tuple[list[str], str | None]:
-    phrases = matching.get_close_phrases_list()
-    if not phrases:
-        return [], None
-    return phrases, json.dumps(phrases, ensure_ascii=False)
+    return matching.close_grammar()
 
 
 def _merge_grammar(*phrase_groups: list[str]) -> list[str]:
-    merged: list[str] = []
-    seen: set[str] = set()
-    for group in phrase_groups:
-        for phrase in group:
-            if phrase and phrase not in seen:
-                seen.add(phrase)
-                merged.append(phrase)
-    return merged
-
-
-def _try_read_cfg_packet(line: str, *, state: dict, rec: Recognizer) -> tuple[str, bool] | None:
+    return [p for p in dict.fromkeys(chain.from_iterable(phrase_groups)) if p]
+
+
+# CFG|KIND|VALUE -> (session state key, mirrored env var)
+_CFG_TARGETS = {
+    "OPEN": ("open_enable_open", "DVC_OPEN_ENABLE_OPEN"),
+    "CLOSE": ("close_enable_voice", "DVC_CLOSE_ENABLE_VOICE"),
+    "DIALOGUE_SELECT": ("dialogue_select_enable", "DVC_DIALOGUE_SELECT_ENABLE"),
+    "SHOUTS": ("shouts_enable", "DVC_SHOUTS_ENABLE"),
+    "POWERS": ("powers_enable", "DVC_POWERS_ENABLE"),
+    "DEBUG": ("debug_enabled", "DVC_DEBUG"),
+    "SAVE_WAV": ("save_wav_enabled", "DVC_SAVE_WAV"),
+    "WEAPONS": ("weapons_enable", "DVC_WEAPONS_ENABLE"),
+    "SPELLS": ("spells_enable", "DVC_SPELLS_ENABLE"),
+    "POTIONS": ("potions_enable", "DVC_POTIONS_ENABLE"),
+}
+_TRUE_SET = frozenset({"1", "true", "yes", "on"})
+
+
+def _try_read_cfg_packet(line: str, *, state: dict, rec: Recognizer) -> tuple[str, bool, bool] | None:
+    """Apply a CFG|KIND|VALUE line; returns (kind, enabled, changed) or None."""
     if not isinstance(line, str) or not line.startswith("CFG|"):
         return None
 
-    parts = line.split("|")
-    if len(parts) != 3:
+    parts = line.split("|", 2)
+    if len(parts) != 3 or "|" in parts[2]:
         return None
 
     kind = parts[1].strip().upper()
-    enabled = parts[2].strip().lower() in ("1", "true", "yes", "on")
-
-    cfg_targets = {
-        "OPEN": ("open_enable_open", "DVC_OPEN_ENABLE_OPEN"),
-        "CLOSE": ("close_enable_voice", "DVC_CLOSE_ENABLE_VOICE"),
-        "DIALOGUE_SELECT": ("dialogue_select_enable", "DVC_DIALOGUE_SELECT_ENABLE"),
-        "SHOUTS": ("shouts_enable", "DVC_SHOUTS_ENABLE"),
-        "POWERS": ("powers_enable", "DVC_POWERS_ENABLE"),
-        "DEBUG": ("debug_enabled", "DVC_DEBUG"),
-        "SAVE_WAV": ("save_wav_enabled", "DVC_SAVE_WAV"),
-        "WEAPONS": ("weapons_enable", "DVC_WEAPONS_ENABLE"),
-        "SPELLS": ("spells_enable", "DVC_SPELLS_ENABLE"),
-        "POTIONS": ("potions_enable", "DVC_POTIONS_ENABLE"),
-    }
-
-    target = cfg_targets.get(kind)
+    target = _CFG_TARGETS.get(kind)
     if target is None:
         return None
+    enabled = parts[2].strip().lower() in _TRUE_SET
 
     state_key, env_key = target
+    changed = state.get(state_key) != enabled
     state[state_key] = bool(enabled)
     os.environ[env_key] = "1" if enabled else "0"
 
@@ -425,7 +474,27 @@ def _try_read_cfg_packet(line: str, *, state: dict, rec: Recognizer) -> tuple[st
         except Exception as e:
             log_warn(f"[SHOUT][WARN] warmup failed after CFG|SHOUTS|1: {e}")
 
-    return (kind, enabled)
+    return (kind, enabled, changed)
+
+
+# TRIG kind -> in-game debug notification prefix
+_COMMAND_ACTIONS = {
+    "power": "Power triggered",
+    "weapon": "Weapon equipped",
+    "spell": "Spell equipped",
+    "potion": "Potion used",
+}
+
+_SHOUT_TRIG_FMT = "TRIG|shout|%s|%s|%s|%.3f|%s"
+# kind -> (TRIG line template, console prefix, in-game notification prefix, listen-state reason)
+_COMMAND_TRIG = {
+    kind: (f"TRIG|{kind}|%s|%.3f|%s", f"[{kind.upper()}] >>> ", f'{action}: "', f"after TRIG|{kind}")
+    for kind, action in _COMMAND_ACTIONS.items()
+}
+
+
+def _fmt_set(items: list[str]) -> str:
+    return "{" + ", ".join([f'"{v}"' for v in items]) + "}"
 
 
 def _print_dialog_options(
@@ -485,12 +554,16 @@ class ClientSession:
             self._reader = reader
             self.read_line = reader.read_line
         self._prefetch_lines = list(prefetch_lines or [])
+        # wakes the listen loop's idle waits early on buffered input or cfg changes
+        self._wake = threading.Event()
+        self._reader.wake = self._wake
 
         self.listen_mode = False
         self.dialog_mode = False
         self.listen_shouts = False
         self.listen_shouts_before_dialog = False
         self.options: list[str] = []
+        self.dialog_index = matching.DialogueIndex([])
         self.dialog_grammar_phrases: list[str] = []
         self.dialog_grammar_json: str | None = None
         self.close_grammar_phrases: list[str] = []
@@ -504,8 +577,23 @@ class ClientSession:
         self._pending_cfg_reason: str | None = None
         self._pending_cfg_effective = False
         self.voice_state = VoiceState()
+        # set when self.state changes; lets _send_effective_if_changed skip no-op updates
+        self._features_dirty = True
+        self._last_sent_modes: tuple[bool, bool] | None = None
         self._shout_id_to_name: dict[str, str] = {}
+        # (tag, rec.grammar_version) -> formatted no-match grammar block
+        self._grammar_block_cache: dict[tuple[str, int], str] = {}
+        # Recognizer models are fixed for the session, so the no-match log prefix is built once.
+        self._backend_str = str(rec.asr_engine or "?")
+        if self._backend_str == "whisper":
+            self._main_model_str = str(rec.model_size or "")
+        else:
+            self._main_model_str = str(rec.vosk_model_name or rec.vosk_model_path or "")
+        self._detail_prefix = f"backend={self._backend_str} main_model={self._main_model_str}"
         self._shouts_map_name: dict[str, str] = _load_shouts_map_names()
+        # editor id -> display name; favorites names take precedence over the shipped map
+        self._shout_display_name: dict[str, str] = {}
+        self._rebuild_shout_display_names()
 
         self.state = {
             "open_enable_open": bool(open_enable_open),
@@ -519,9 +607,59 @@ class ClientSession:
             "debug_enabled": bool(getattr(rec, "debug_enabled", False)),
             "save_wav_enabled": bool(getattr(rec, "save_wav_enabled", False)),
         }
+        self._refresh_state_flags()
+
+        self._non_dialog_handlers = {
+            CMD_CLOSE: self._non_dialog_close,
+            CMD_LISTEN_OFF: self._non_dialog_listen_off,
+            CMD_LISTEN_ON: self._non_dialog_listen_on,
+            CMD_LISTEN_SHOUTS_ON: self._non_dialog_listen_shouts_on,
+            CMD_LISTEN_SHOUTS_OFF: self._non_dialog_listen_shouts_off,
+        }
+        self._dialog_handlers = {
+            CMD_CLOSE: self._dialog_close,
+            CMD_LISTEN_SHOUTS_ON: self._dialog_listen_shouts_on,
+            CMD_LISTEN_SHOUTS_OFF: self._dialog_listen_shouts_off,
+            CMD_LISTEN_ON: self._dialog_listen_on,
+            CMD_LISTEN_OFF: self._non_dialog_listen_off,
+        }
+        # idle shares the plain toggles with the non-dialog path
+        self._idle_handlers = {
+            CMD_LISTEN_ON: self._idle_listen_on,
+            CMD_LISTEN_SHOUTS_ON: self._non_dialog_listen_shouts_on,
+            CMD_LISTEN_SHOUTS_OFF: self._non_dialog_listen_shouts_off,
+            CMD_LISTEN_OFF: self._non_dialog_listen_off,
+        }
 
         self.audio.set_abort_checker(self._has_pending_data)
 
+    def _refresh_state_flags(self) -> None:
+        """Mirror self.state into plain attributes read by the listen loop."""
+        state = self.state
+        self._open_enable = bool(state.get("open_enable_open", False))
+        self._close_enable = bool(state.get("close_enable_voice", False))
+        self._shouts_enable = bool(state.get("shouts_enable", False))
+        self._powers_enable = bool(state.get("powers_enable", False))
+        self._weapons_enable = bool(state.get("weapons_enable", False))
+        self._spells_enable = bool(state.get("spells_enable", False))
+        self._potions_enable = bool(state.get("potions_enable", False))
+        self._debug_enabled = bool(state.get("debug_enabled", False))
+        self._items_enable = self._weapons_enable or self._spells_enable or self._potions_enable
+        self._commands_enable = self._shouts_enable or self._powers_enable or self._items_enable
+        self._item_kinds = tuple(
+            kind for kind, enabled in (
+                ("weapon", self._weapons_enable),
+                ("spell", self._spells_enable),
+                ("potion", self._potions_enable),
+            ) if enabled
+        )
+        self._command_kinds = (("power",) if self._powers_enable else ()) + self._item_kinds
+        self._wake.set()
+
+    def _rebuild_shout_display_names(self) -> None:
+        # Both maps hold stripped, non-empty names; favorites override the shipped map.
+        self._shout_display_name = {**self._shouts_map_name, **self._shout_id_to_name}
+
     def _feature_enabled_snapshot(self) -> dict[str, bool]:
         return {
             "select": bool(self.state.get("dialogue_select_enable", False)),
@@ -541,6 +679,11 @@ class ClientSession:
         return self.voice_state.effective()
 
     def _send_effective_if_changed(self, *, reason: str | None = None) -> None:
+        modes = (self.dialog_mode, self.listen_mode)
+        if not self._features_dirty and modes == self._last_sent_modes:
+            return
+        self._features_dirty = False
+        self._last_sent_modes = modes
         self.voice_state.set_feature_enabled(self._feature_enabled_snapshot())
         self.voice_state.set_dialog_open(self.dialog_mode)
         self.voice_state.set_focus_on(self.listen_mode)
@@ -565,10 +708,13 @@ class ClientSession:
             return self._prefetch_lines.pop(0)
         return self._rl()
 
-    def _send_debug_notification(self, text: str) -> None:
-        if not bool(self.state.get("debug_enabled", False)):
+    def _send_debug_notification(self, text: str, out: PipeBatcher | None = None) -> None:
+        if not self._debug_enabled:
             return
-        write_dbg_line(self.pipe, text)
+        if out is None:
+            write_dbg_line(self.pipe, text)
+        else:
+            out.write_dbg_line(text)
 
     def _format_trigger_name(self, raw_text: str | None) -> str:
         name = (raw_text or "").strip()
@@ -651,6 +797,7 @@ class ClientSession:
 
     def _open_dialog(self, new_options: list[str], *, reason: str) -> None:
         self.options = new_options
+        self.dialog_index = matching.dialogue_index(new_options)
         self.dialog_grammar_phrases, self.dialog_grammar_json = _dialog_grammar(self.options)
         self.close_grammar_phrases, self.close_grammar_json = _close_grammar()
         merged_grammar = _merge_grammar(self.dialog_grammar_phrases, self.close_grammar_phrases)
@@ -667,6 +814,7 @@ class ClientSession:
 
     def _update_dialog(self, new_options: list[str]) -> None:
         self.options = new_options
+        self.dialog_index = matching.dialogue_index(new_options)
         self.dialog_grammar_phrases, self.dialog_grammar_json = _dialog_grammar(self.options)
         self.close_grammar_phrases, self.close_grammar_json = _close_grammar()
         merged_grammar = _merge_grammar(self.dialog_grammar_phrases, self.close_grammar_phrases)
@@ -685,7 +833,10 @@ class ClientSession:
     def _handle_cfg_or_shouts(self, line: str, *, reason: str) -> bool:
         cfg = _try_read_cfg_packet(line, state=self.state, rec=self.rec)
         if cfg is not None:
-            kind, enabled = cfg
+            kind, enabled, changed = cfg
+            if changed:
+                self._features_dirty = True
+                self._refresh_state_flags()
             self._queue_cfg_log(reason, kind, enabled)
             self._pending_cfg_effective = True
             if not self._has_pending_data():
@@ -694,7 +845,7 @@ class ClientSession:
         return False
 
     def _handle_favorites_packet(self, line: str) -> bool:
-        if line != "FAV|BEGIN":
+        if line != CMD_FAV_BEGIN:
             return False
 
         shouts: list[tuple[str, str, str, str]] = []
@@ -702,6 +853,14 @@ class ClientSession:
         weapons: list[tuple[str, str]] = []
         spells: list[tuple[str, str]] = []
         potions: list[tuple[str, str]] = []
+        # kind -> (append, number of fields after the kind)
+        sinks = {
+            "SHOUT": (shouts.append, 4),
+            "POWER": (powers.append, 2),
+            "WEAPON": (weapons.append, 2),
+            "SPELL": (spells.append, 2),
+            "POTION": (potions.append, 2),
+        }
 
         while True:
             l2 = self._rl()
@@ -713,18 +872,12 @@ class ClientSession:
             parts = l2.split("|")
             if len(parts) < 2:
                 continue
-            kind = parts[1].strip().upper()
-
-            if kind == "SHOUT" and len(parts) >= 6:
-                shouts.append((parts[2], parts[3], parts[4], parts[5]))
-            elif kind == "POWER" and len(parts) >= 4:
-                powers.append((parts[2], parts[3]))
-            elif kind == "WEAPON" and len(parts) >= 4:
-                weapons.append((parts[2], parts[3]))
-            elif kind == "SPELL" and len(parts) >= 4:
-                spells.append((parts[2], parts[3]))
-            elif kind == "POTION" and len(parts) >= 4:
-                potions.append((parts[2], parts[3]))
+            sink = sinks.get(parts[1].strip().upper())
+            if sink is None:
+                continue
+            append, width = sink
+            if len(parts) >= width + 2:
+                append(tuple(parts[2:width + 2]))
 
         try:
             self.rec.set_allowed_shout_entries(shouts)
@@ -736,30 +889,23 @@ class ClientSession:
             log_warn(f"[FAVORITES][WARN] failed to apply favorites: {e}")
             return True
 
-        def _names(entries: list[tuple], idx: int) -> list[str]:
-            out: list[str] = []
-            for entry in entries:
-                if len(entry) <= idx:
-                    continue
-                name = str(entry[idx] or "").strip()
-                if name:
-                    out.append(name)
-            return out
-
-        sh_names = _names(shouts, 2)
-        pw_names = _names(powers, 1)
-        we_names = _names(weapons, 1)
-        sp_names = _names(spells, 1)
-        po_names = _names(potions, 1)
-
-        self._shout_id_to_name = {}
-        for entry in shouts:
-            if len(entry) < 4:
+        # Entries are fixed-width tuples of split strings (see sinks above).
+        sh_names: list[str] = []
+        shout_id_to_name: dict[str, str] = {}
+        for _, _, raw_name, raw_id in shouts:
+            name = raw_name.strip()
+            if not name:
                 continue
-            name = str(entry[2] or "").strip()
-            editor_id = _normalize_shout_id(entry[3])
-            if editor_id and name:
-                self._shout_id_to_name[editor_id] = name
+            sh_names.append(name)
+            editor_id = _normalize_shout_id(raw_id)
+            if editor_id:
+                shout_id_to_name[editor_id] = name
+        self._shout_id_to_name = shout_id_to_name
+        self._rebuild_shout_display_names()
+        pw_names = [n for _, raw in powers if (n := raw.strip())]
+        we_names = [n for _, raw in weapons if (n := raw.strip())]
+        sp_names = [n for _, raw in spells if (n := raw.strip())]
+        po_names = [n for _, raw in potions if (n := raw.strip())]
 
         def _fmt(names: list[str]) -> str:
             return ", ".join([f'"{name}"' for name in names])
@@ -774,291 +920,256 @@ class ClientSession:
             flush=True,
         )
 
-        if self.state.get("debug_enabled", False):
+        if self._debug_enabled:
             self._send_debug_notification("Fav updated")
 
         return True
 
+    def _non_dialog_close(self) -> bool:
+        self._reset_dialog_state()
+        self.listen_shouts = self.listen_shouts_before_dialog
+        self._send_effective_if_changed(reason="dialog CLOSE")
+        return True
+
+    def _non_dialog_listen_off(self) -> bool:
+        self.listen_mode = False
+        return True
+
+    def _non_dialog_listen_on(self) -> bool:
+        self.listen_mode = True
+        return True
+
+    def _non_dialog_listen_shouts_on(self) -> bool:
+        if self._commands_enable:
+            self.listen_shouts = True
+        else:
+            print("[LISTEN|SHOUTS] ignored: no voice command features enabled", flush=True)
+        return True
+
+    def _non_dialog_listen_shouts_off(self) -> bool:
+        self.listen_shouts = False
+        return True
+
     def _handle_non_dialog_line(self, line: str) -> bool:
-        if self._handle_favorites_packet(line):
-            return True
-        if self._handle_cfg_or_shouts(line, reason="cfg update"):
-            return True
+        # Fixed tokens are resolved first so they skip the packet prefix checks.
+        handler = self._non_dialog_handlers.get(line)
+        if handler is None:
+            if self._handle_favorites_packet(line):
+                return True
+            if self._handle_cfg_or_shouts(line, reason="cfg update"):
+                return True
         if self._pending_cfg_log:
             self._flush_cfg_log(force=True)
-        if line == CMD_CLOSE:
-            self._reset_dialog_state()
-            self.listen_shouts = self.listen_shouts_before_dialog
-            self._send_effective_if_changed(reason="dialog CLOSE")
-            return True
-        if line == CMD_LISTEN_OFF:
-            self.listen_mode = False
-            return True
-        if line == CMD_LISTEN_ON:
-            self.listen_mode = True
-            return True
-        if line == CMD_LISTEN_SHOUTS_ON:
-            if self.state.get("shouts_enable", False) or self.state.get("powers_enable", False) or self._any_items_enabled():
-                self.listen_shouts = True
-            else:
-                print("[LISTEN|SHOUTS] ignored: no voice command features enabled", flush=True)
-            return True
-        if line == CMD_LISTEN_SHOUTS_OFF:
-            self.listen_shouts = False
-            return True
+        if handler is not None:
+            return handler()
         if line.startswith(CMD_OPEN_PREFIX):
             self._open_dialog(read_open_packet(self.read_line, self.pipe), reason="dialog OPEN")
             return False
         return True
 
+    def _dialog_close(self) -> bool:
+        self._close_dialog(reason="dialog CLOSE")
+        return True
+
+    def _dialog_listen_shouts_on(self) -> bool:
+        self.listen_shouts_before_dialog = True
+        return True
+
+    def _dialog_listen_shouts_off(self) -> bool:
+        self.listen_shouts_before_dialog = False
+        return True
+
+    def _dialog_listen_on(self) -> bool:
+        self._reset_dialog_state()
+        self.listen_mode = True
+        self.listen_shouts = self.listen_shouts_before_dialog
+        self._send_effective_if_changed(reason="dialog CLOSE")
+        return True
+
     def _handle_dialog_line(self, line: str) -> bool:
-        if self._handle_favorites_packet(line):
-            return True
-        if self._handle_cfg_or_shouts(line, reason="cfg update (dialog)"):
-            return True
+        handler = self._dialog_handlers.get(line)
+        if handler is None:
+            if self._handle_favorites_packet(line):
+                return True
+            if self._handle_cfg_or_shouts(line, reason="cfg update (dialog)"):
+                return True
         if self._pending_cfg_log:
             self._flush_cfg_log(force=True)
+        if handler is not None:
+            return handler()
         if line.startswith(CMD_OPEN_PREFIX):
             self._update_dialog(read_open_packet(self.read_line, self.pipe))
             return True
-        if line == CMD_CLOSE:
-            self._close_dialog(reason="dialog CLOSE")
-            return True
-        if line == CMD_LISTEN_SHOUTS_ON:
-            self.listen_shouts_before_dialog = True
-            return True
-        if line == CMD_LISTEN_SHOUTS_OFF:
-            self.listen_shouts_before_dialog = False
-            return True
-        if line == CMD_LISTEN_ON:
-            self._reset_dialog_state()
-            self.listen_mode = True
-            self.listen_shouts = self.listen_shouts_before_dialog
-            self._send_effective_if_changed(reason="dialog CLOSE")
-            return True
-        if line == CMD_LISTEN_OFF:
-            self.listen_mode = False
-            return True
         return False
 
+    def _idle_listen_on(self) -> bool:
+        self.listen_mode = self._open_enable or self._commands_enable
+        return True
+
     def _handle_idle_line(self, line: str) -> None:
-        if self._handle_favorites_packet(line):
-            return
-        if self._handle_cfg_or_shouts(line, reason="cfg update (idle)"):
-            return
+        handler = self._idle_handlers.get(line)
+        if handler is None:
+            if self._handle_favorites_packet(line):
+                return
+            if self._handle_cfg_or_shouts(line, reason="cfg update (idle)"):
+                return
         if self._pending_cfg_log:
             self._flush_cfg_log(force=True)
+        if handler is not None:
+            handler()
+            return
         if line.startswith(CMD_OPEN_PREFIX):
             self._open_dialog(read_open_packet(self.read_line, self.pipe), reason="dialog OPEN (idle)")
-            return
-        if line == CMD_LISTEN_ON:
-            if self.state["open_enable_open"] or self._any_command_enabled():
-                self.listen_mode = True
-            else:
-                self.listen_mode = False
-            return
-        if line == CMD_LISTEN_SHOUTS_ON:
-            if self.state.get("shouts_enable", False) or self.state.get("powers_enable", False) or self._any_items_enabled():
-                self.listen_shouts = True
-            else:
-                print("[LISTEN|SHOUTS] ignored: no voice command features enabled", flush=True)
-            return
-        if line == CMD_LISTEN_SHOUTS_OFF:
-            self.listen_shouts = False
-            return
-        if line == CMD_LISTEN_OFF:
-            self.listen_mode = False
+
+    def _format_grammar_block(self, tag: str) -> str:
+        rec = self.rec
+        if tag == "SHOUT":
+            entries, phrases, phrase_list, lang, shout_detail = rec.get_shout_grammar_info()
+            quoted = ", ".join([f'"{phrase}"' for phrase in phrase_list])
+        else:
+            getter = {
+                "SPELL": rec.get_spell_grammar_info,
+                "POWER": rec.get_power_grammar_info,
+                "WEAPON": rec.get_weapon_grammar_info,
+                "POTION": rec.get_potion_grammar_info,
+            }[tag]
+            entries, phrases, phrase_list, quoted = getter()
+            lang, shout_detail = None, None
+        lang_part = f" grammar_lang={lang}" if lang else ""
+        header = f"grammar_entries={entries} phrases={phrases}{lang_part}"
+        if tag == "SHOUT" and shout_detail:
+            parts = []
+            for sid in sorted(shout_detail.keys()):
+                sid_key = _normalize_shout_id(sid)
+                variants = list(shout_detail.get(sid) or [])
+                if not variants:
+                    continue
+                shout_name = self._shout_display_name.get(sid_key, "")
+                if shout_name:
+                    parts.append(f"{shout_name} {sid_key} {_fmt_set(variants)}")
+                else:
+                    parts.append(f"{sid_key} {_fmt_set(variants)}")
+            if parts:
+                return f"Shouts: {header} [{', '.join(parts)}]"
+            return f"Shouts: {header}"
+        label = tag.capitalize() + "s"
+        if phrase_list:
+            return f"{label}: {header} [{quoted}]"
+        return f"{label}: {header}"
+
+    def _grammar_block(self, tag: str) -> str:
+        # Grammars only change on FAV/cfg updates, which bump rec.grammar_version.
+        key = (tag, self.rec.grammar_version)
+        cache = self._grammar_block_cache
+        block = cache.get(key)
+        if block is None:
+            block = self._format_grammar_block(tag)
+            if len(cache) >= 16:
+                del cache[next(iter(cache))]
+            cache[key] = block
+        return block
 
     def _maybe_log_shout_no_match(self, vad_stats: dict | None, shout_dbg: dict | None, power_dbg: dict | None = None) -> None:
         now = time.perf_counter()
         if now - self.last_shout_no_match_ts <= 1.0:
             return
         self.last_shout_no_match_ts = now
+        dbg = shout_dbg or {}
+        reason = str(dbg.get("reason", "no_match"))
+        log_warn(f"[LISTEN][WARN] Voice Command unrecognized (attempt={self.shout_attempts})")
+        # The detail line and grammar dump are diagnostics only; skip building them unless debug is on.
+        if not self._debug_enabled:
+            self._send_no_match_hints(reason)
+            return
         utt = None
         tsil = None
         if isinstance(vad_stats, dict):
             utt = vad_stats.get("utt_sec")
             tsil = vad_stats.get("tail_sil_ms")
-        backend = str(self.rec.asr_engine or "?")
-        reason = str((shout_dbg or {}).get("reason", "no_match"))
-        tp_reason = (shout_dbg or {}).get("two_phase_reason")
-        tp_score = (shout_dbg or {}).get("two_phase_score")
-        vosk_model = (shout_dbg or {}).get("vosk_model")
-        main_whisper_model = str(getattr(self.rec, "model_size", ""))
-        main_vosk_model = str(getattr(self.rec, "vosk_model_name", "") or getattr(self.rec, "vosk_model_path", ""))
-        main_model = main_whisper_model if backend == "whisper" else main_vosk_model
-        err = (shout_dbg or {}).get("error")
-        log_warn(f"[LISTEN][WARN] Voice Command unrecognized (attempt={self.shout_attempts})")
-        detail_parts = [
-            f"backend={backend}",
-            f"main_model={main_model}",
+        err = dbg.get("error")
+        detail_line = " ".join((
+            self._detail_prefix,
             f"reason={reason}",
-            f"voice-commands_model={vosk_model}",
-            f"two_phase_reason={tp_reason}",
-            f"two_phase_score={tp_score}",
-        ]
-        if utt is not None:
-            detail_parts.append(f"utt_sec={utt}")
-        if tsil is not None:
-            detail_parts.append(f"tail_sil_ms={tsil}")
-        if err:
-            detail_parts.append(f"error={err}")
-
-        detail_line = " ".join(detail_parts)
-
-        def _fmt_set(items: list[str]) -> str:
-            return "{" + ", ".join([f'"{v}"' for v in items]) + "}"
-
-        def _format_grammar_block(
-            tag: str,
-            entries: int,
-            phrases: int,
-            phrase_list: list[str],
-            lang: str | None = None,
-            *,
-            shout_detail: dict[str, list[str]] | None = None,
-        ) -> str:
-            lang_part = f" grammar_lang={lang}" if lang else ""
-            header = f"grammar_entries={entries} phrases={phrases}{lang_part}"
-            if tag == "SHOUT" and shout_detail:
-                parts = []
-                for sid in sorted(shout_detail.keys()):
-                    sid_key = _normalize_shout_id(sid)
-                    variants = list(shout_detail.get(sid) or [])
-                    if not variants:
-                        continue
-                    shout_name = (
-                        self._shout_id_to_name.get(sid_key)
-                        or self._shouts_map_name.get(sid_key, "")
-                    ).strip()
-                    if shout_name:
-                        parts.append(f"{shout_name} {sid_key} {_fmt_set(variants)}")
-                    else:
-                        parts.append(f"{sid_key} {_fmt_set(variants)}")
-                if parts:
-                    return f"Shouts: {header} [{', '.join(parts)}]"
-                return f"Shouts: {header}"
-            label = tag.capitalize() + "s"
-            if phrase_list:
-                quoted = [f'"{phrase}"' for phrase in phrase_list]
-                return f"{label}: {header} [{', '.join(quoted)}]"
-            return f"{label}: {header}"
+            f"voice-commands_model={dbg.get('vosk_model')}",
+            f"two_phase_reason={dbg.get('two_phase_reason')}",
+            f"two_phase_score={dbg.get('two_phase_score')}",
+            *((f"utt_sec={utt}",) if utt is not None else ()),
+            *((f"tail_sil_ms={tsil}",) if tsil is not None else ()),
+            *((f"error={err}",) if err else ()),
+        ))
 
         grammar_parts: list[str] = []
-        sh_entries, sh_phrases, sh_list, sh_lang, sh_detail = self.rec.get_shout_grammar_info()
-        if self.state.get("shouts_enable", False):
-            grammar_parts.append(
-                _format_grammar_block("SHOUT", sh_entries, sh_phrases, sh_list, sh_lang, shout_detail=sh_detail)
-            )
-
-        sp_entries, sp_phrases, sp_list = self.rec.get_spell_grammar_info()
-        if self.state.get("spells_enable", False):
-            grammar_parts.append(_format_grammar_block("SPELL", sp_entries, sp_phrases, sp_list))
-
-        power_active = False
-        if power_dbg:
-            p_reason = str(power_dbg.get("reason") or "")
-            power_active = p_reason != "powers_disabled"
-        pw_entries, pw_phrases, pw_list = self.rec.get_power_grammar_info()
-        if power_active:
-            grammar_parts.append(_format_grammar_block("POWER", pw_entries, pw_phrases, pw_list))
-
-        we_entries, we_phrases, we_list = self.rec.get_weapon_grammar_info()
-        if self.state.get("weapons_enable", False):
-            grammar_parts.append(_format_grammar_block("WEAPON", we_entries, we_phrases, we_list))
-
-        po_entries, po_phrases, po_list = self.rec.get_potion_grammar_info()
-        if self.state.get("potions_enable", False):
-            grammar_parts.append(_format_grammar_block("POTION", po_entries, po_phrases, po_list))
+        if self._shouts_enable:
+            grammar_parts.append(self._grammar_block("SHOUT"))
+        if self._spells_enable:
+            grammar_parts.append(self._grammar_block("SPELL"))
+        if power_dbg and str(power_dbg.get("reason") or "") != "powers_disabled":
+            grammar_parts.append(self._grammar_block("POWER"))
+        if self._weapons_enable:
+            grammar_parts.append(self._grammar_block("WEAPON"))
+        if self._potions_enable:
+            grammar_parts.append(self._grammar_block("POTION"))
 
         if grammar_parts:
-            detail_line = detail_line + " " + " ".join(grammar_parts)
+            detail_line = " ".join((detail_line, *grammar_parts))
         print(detail_line, flush=True)
+        self._send_no_match_hints(reason)
 
+    def _send_no_match_hints(self, reason: str) -> None:
+        if not self._debug_enabled:
+            return
         # In-game debug hint (shown by plugin as [DVC] ...)
         # Keep the main phrase stable for user-facing diagnostics.
-        self._send_debug_notification("Command unrecognized")
+        out = PipeBatcher(self.pipe)
+        self._send_debug_notification("Command unrecognized", out)
 
         # If recognizer returned an explicit "empty" reason, show it too.
         if reason in ("empty_audio", "phase_a_grammar_empty"):
-            self._send_debug_notification(f"Empty recognition: {reason}")
+            self._send_debug_notification(f"Empty recognition: {reason}", out)
+        out.flush()
 
     def _handle_shout_recognition(self, pcm16, vad_stats) -> bool:
         self.shout_attempts += 1
         _save_debug_wav("shout", pcm16, self.rec)
         shout_result, shout_dbg = self.rec.recognize_shout_debug(pcm16)
         if not shout_result:
-            power_result = None
             power_dbg = None
             if not _whisper_voice_commands_enabled(self.rec):
-                power_result, power_dbg = self.rec.recognize_power_debug(pcm16)
-            if power_result:
-                formid_hex, score, raw_text = power_result
-                msg = f"TRIG|power|{formid_hex}|{score:.3f}|{raw_text}"
-                write_line(self.pipe, msg)
-                print(f"[POWER] >>> {msg}", flush=True)
-                self._send_debug_notification(f"Power triggered: \"{self._format_trigger_name(raw_text)}\"")
-                self._log_listen_state("after TRIG|power", force=True)
-                return True
-
-            if not _whisper_voice_commands_enabled(self.rec):
-                # Try weapon/spell/potion recognition
-                item_result = self._try_item_recognition(pcm16)
-                if item_result:
+                # Enabled powers and items share one decode; disabled kinds are never decoded
+                if self._try_command_recognition(pcm16, self._command_kinds):
                     return True
+                powers_live = self._powers_enable and self.rec.has_command_grammar("power")
+                power_dbg = {"reason": "no_match" if powers_live else "powers_disabled"}
 
             self._maybe_log_shout_no_match(vad_stats, shout_dbg, power_dbg)
             return False
         plugin, baseid, power, score, raw_text = shout_result
-        msg = f"TRIG|shout|{plugin}|{baseid}|{power}|{score:.3f}|{raw_text}"
-        write_line(self.pipe, msg)
-        print(f"[SHOUT] >>> {msg}", flush=True)
-        self._send_debug_notification(
-            f"Shout triggered: \"{self._format_trigger_name(raw_text)}\" power={power}"
-        )
+        msg = _SHOUT_TRIG_FMT % (plugin, baseid, power, score, raw_text)
+        out = PipeBatcher(self.pipe)
+        out.write_line(msg)
+        if self._debug_enabled:
+            out.write_dbg_line('Shout triggered: "' + self._format_trigger_name(raw_text) + '" power=' + str(power))
+        out.flush()
+        print("[SHOUT] >>> " + msg, flush=True)
         self._log_listen_state("after TRIG|shout", force=True)
         return True
 
-    def _try_item_recognition(self, pcm16) -> bool:
-        """Try recognizing weapons, spells, potions. Returns True if matched."""
-        for kind in ("weapon", "spell", "potion"):
-            if not self.state.get(f"{kind}s_enable", False):
-                continue
-            method_name = f"recognize_{kind}"
-            if not hasattr(self.rec, method_name):
-                continue
-            result = getattr(self.rec, method_name)(pcm16)
-            if result:
-                formid_hex, score, raw_text = result
-                msg = f"TRIG|{kind}|{formid_hex}|{score:.3f}|{raw_text}"
-                write_line(self.pipe, msg)
-                print(f"[{kind.upper()}] >>> {msg}", flush=True)
-                action = {
-                    "weapon": "Weapon equipped",
-                    "spell": "Spell equipped",
-                    "potion": "Potion used",
-                }.get(kind)
-                if action:
-                    self._send_debug_notification(
-                        f"{action}: \"{self._format_trigger_name(raw_text)}\""
-                    )
-                self._log_listen_state(f"after TRIG|{kind}", force=True)
-                return True
-        return False
-
-    def _try_power_recognition(self, pcm16) -> bool:
-        if not self.state.get("powers_enable", False):
-            return False
-        result = self.rec.recognize_power(pcm16)
-        if result:
-            formid_hex, score, raw_text = result
-            msg = f"TRIG|power|{formid_hex}|{score:.3f}|{raw_text}"
-            write_line(self.pipe, msg)
-            print(f"[POWER] >>> {msg}", flush=True)
-            self._send_debug_notification(f"Power triggered: \"{self._format_trigger_name(raw_text)}\"")
-            self._log_listen_state("after TRIG|power", force=True)
-            return True
-        return False
+    def _try_command_recognition(self, pcm16, kinds: tuple[str, ...]) -> str | None:
+        """Recognize powers/weapons/spells/potions in one pass. Returns the matched kind."""
+        hit = self.rec.recognize_command(pcm16, kinds)
+        if not hit:
+            return None
+        kind, (formid_hex, score, raw_text) = hit
+        trig_fmt, console_prefix, notify_prefix, state_reason = _COMMAND_TRIG[kind]
+        msg = trig_fmt % (formid_hex, score, raw_text)
+        out = PipeBatcher(self.pipe)
+        out.write_line(msg)
+        if self._debug_enabled:
+            out.write_dbg_line(notify_prefix + self._format_trigger_name(raw_text) + '"')
+        out.flush()
+        print(console_prefix + msg, flush=True)
+        self._log_listen_state(state_reason, force=True)
+        return kind
 
     def _handle_open_recognition(self, pcm16) -> None:
         _save_debug_wav("open", pcm16, self.rec)
@@ -1071,9 +1182,11 @@ class ClientSession:
             print(f"[LISTEN] heard: \"{text}\" -> matched={matched}, score={score:.3f}", flush=True)
 
         if matched:
-            write_dbg_line(self.pipe, f'Recognition: "{text}"')
-            write_dbg_line(self.pipe, f'Dialogue Open: "{phrase}" score={score:.3f}')
-            write_line(self.pipe, f"TRIG|open|{score:.3f}|{text}")
+            out = PipeBatcher(self.pipe)
+            out.write_dbg_line(f'Recognition: "{text}"')
+            out.write_dbg_line(f'Dialogue Open: "{phrase}" score={score:.3f}')
+            out.write_line(f"TRIG|open|{score:.3f}|{text}")
+            out.flush()
             print(f"[LISTEN] >>> TRIG|open|{score:.3f}|{text}", flush=True)
             self.listen_mode = False
             self.listen_shouts_before_dialog = self.listen_shouts
@@ -1089,11 +1202,7 @@ class ClientSession:
         )
 
     def _can_listen_now(self) -> bool:
-        open_enabled = self.listen_mode and self.state["open_enable_open"]
-        shouts_enabled = self.state["shouts_enable"] and self.listen_shouts
-        powers_enabled = self.state.get("powers_enable", False) and self.listen_shouts
-        items_enabled = self._any_items_enabled() and self.listen_shouts
-        return bool(open_enabled or shouts_enabled or powers_enabled or items_enabled)
+        return bool((self.listen_mode and self._open_enable) or (self.listen_shouts and self._commands_enable))
 
     def _drain_non_dialog_pipe_commands(self) -> None:
         while self._has_pending_data() and (not self.dialog_mode):
@@ -1101,39 +1210,29 @@ class ClientSession:
                 break
 
     def _process_listen_capture(self, pcm16, vad_stats) -> None:
-        if self.listen_shouts and self._any_command_enabled():
+        if self.listen_shouts and self._commands_enable:
             if self._handle_shout_recognition(pcm16, vad_stats):
                 return
         if self.listen_shouts and _whisper_voice_commands_enabled(self.rec):
-            if self._try_power_recognition(pcm16):
+            # A power ends the capture; item hits still fall through to open phrases.
+            if self._try_command_recognition(pcm16, self._command_kinds) == "power":
                 return
-            self._try_item_recognition(pcm16)
-        if self.listen_mode and self.state["open_enable_open"]:
+        if self.listen_mode and self._open_enable:
             self._handle_open_recognition(pcm16)
 
-    def _any_items_enabled(self) -> bool:
-        return bool(
-            self.state.get("weapons_enable", False)
-            or self.state.get("spells_enable", False)
-            or self.state.get("potions_enable", False)
-        )
-
-    def _any_command_enabled(self) -> bool:
-        return bool(
-            self.state.get("shouts_enable", False)
-            or self.state.get("powers_enable", False)
-            or self._any_items_enabled()
-        )
+    def _idle_wait(self, timeout: float) -> None:
+        if self._wake.wait(timeout):
+            self._wake.clear()
 
     def _run_listen_iteration(self) -> None:
         if self._awaiting_dialog_open_without_pipe_data():
-            time.sleep(0.01)
+            self._idle_wait(0.01)
             return
 
         if not self._can_listen_now():
             self.listen_mode = False
             self._log_listen_state("auto idle (nothing enabled)")
-            time.sleep(0.05)
+            self._idle_wait(0.05)
             return
 
         self._drain_non_dialog_pipe_commands()
@@ -1147,8 +1246,8 @@ class ClientSession:
 
         self._process_listen_capture(pcm16, vad_stats)
 
-    def _capture_dialog_audio(self):
-        pcm16, vad_stats, cap_reason = self.audio.capture_for_dialogue()
+    def _capture_dialog_audio(self, on_speech=None):
+        pcm16, vad_stats, cap_reason = self.audio.capture_for_dialogue(on_speech)
         if cap_reason == "pipe":
             return None, None
         if pcm16 is None:
@@ -1159,85 +1258,92 @@ class ClientSession:
             return None, None
         return pcm16, vad_stats
 
-    def _recognize_dialog_with_fallback(self, pcm16):
-        text, asr_stats = self.rec.transcribe_dialogue(pcm16)
+    def _recognize_dialog_with_fallback(self, pcm16, streamed: bool = False):
+        if streamed:
+            text, asr_stats = self.rec.finish_dialogue_stream()
+        else:
+            text, asr_stats = self.rec.transcribe_dialogue(pcm16)
         t_m0 = time.perf_counter()
-        scores = matching.rank_dialogue_options(text, self.options)
-        idx0, sc1 = matching.best_dialogue_option(text, self.options)
+        mcfg = matching.get_match_cfg()
+        scores, idx0, sc1 = matching.top_k_dialogue_options_indexed(text, self.dialog_index, 3, mcfg)
         if self.dialog_grammar_json and self.rec.asr_engine == "vosk" and idx0 < 0:
             print("[DIALOG] no confident match with grammar, fallback to free ASR", flush=True)
             text, asr_stats = self.rec.transcribe_dialogue_free(pcm16)
-            scores = matching.rank_dialogue_options(text, self.options)
-            idx0, sc1 = matching.best_dialogue_option(text, self.options)
+            scores, idx0, sc1 = matching.top_k_dialogue_options_indexed(text, self.dialog_index, 3, mcfg)
         t_m1 = time.perf_counter()
         return text, asr_stats, scores, idx0, sc1, (t_m1 - t_m0)
 
-    def _send_dialog_result(self, idx0: int, sc1: float, close_hit: bool):
+    def _send_dialog_result(self, idx0: int, sc1: float, close_hit: bool, out: PipeBatcher):
         t_s0 = time.perf_counter()
         if close_hit:
-            write_line(self.pipe, "RES|-2|1.0")
+            out.write_line("RES|-2|1.0")
             res_str = "RES|-2"
         elif idx0 >= 0:
-            write_line(self.pipe, f"RES|{idx0}|{sc1:.3f}")
+            out.write_line(f"RES|{idx0}|{sc1:.3f}")
             res_str = f"RES|{idx0}|{sc1:.3f}"
         else:
-            write_line(self.pipe, "RES|-1|0.0")
+            out.write_line("RES|-1|0.0")
             res_str = "RES|-1"
+        # staged DBG lines go out in the same write as the result
+        out.flush()
         t_s1 = time.perf_counter()
-        return res_str, (t_s1 - t_s0)
+        return res_str, (t_s1 - t_s0), t_s1
 
     def _run_dialog_iteration(self) -> None:
         if self._has_pending_data() and self._handle_dialog_line(self._rl()):
             return
 
         t_total0 = time.perf_counter()
-        pcm16, vad_stats = self._capture_dialog_audio()
+        # PTT records in one blocking call, so only VAD capture can feed the decoder as it goes.
+        feed = self.rec.start_dialogue_stream() if self.audio.mode == "vad" else None
+        pcm16, vad_stats = self._capture_dialog_audio(feed)
         if pcm16 is None:
             return
 
         _save_debug_wav("dialogue", pcm16, self.rec)
 
-        text, asr_stats, scores, idx0, sc1, t_match = self._recognize_dialog_with_fallback(pcm16)
+        text, asr_stats, scores, idx0, sc1, t_match = self._recognize_dialog_with_fallback(pcm16, feed is not None)
 
         close_hit, close_score, close_phrase = (False, 0.0, "")
-        if self.state["close_enable_voice"]:
+        if self._close_enable:
             close_hit, close_score, close_phrase = matching.match_close(text)
             if close_hit:
                 _save_debug_wav("close", pcm16, self.rec)
 
         close_selected = bool(close_hit and idx0 < 0)
 
+        out = PipeBatcher(self.pipe)
         if close_selected:
-            write_dbg_line(self.pipe, f'Recognition: "{text}"')
-            write_dbg_line(self.pipe, f'Dialogue Close: "{close_phrase}" score={close_score:.3f}')
+            out.write_dbg_line(f'Recognition: "{text}"')
+            out.write_dbg_line(f'Dialogue Close: "{close_phrase}" score={close_score:.3f}')
         elif idx0 >= 0:
-            write_dbg_line(self.pipe, f'Recognition: "{text}"')
-            write_dbg_line(self.pipe, f'Dialogue pick {idx0} score={sc1:.3f}')
+            out.write_dbg_line(f'Recognition: "{text}"')
+            out.write_dbg_line(f'Dialogue pick {idx0} score={sc1:.3f}')
 
-        res_str, t_send = self._send_dialog_result(idx0, sc1, close_selected)
-        t_total1 = time.perf_counter()
+        # the send's end stamp doubles as the end of the turn
+        res_str, t_send, t_total1 = self._send_dialog_result(idx0, sc1, close_selected, out)
 
-        print("\n--- RECOGNIZED ---")
-        print(text)
+        # One print for the whole block; the timestamped print prefixes each line.
+        lines = ["\n--- RECOGNIZED ---", text]
         if close_selected:
-            print(f"[CLOSE-ASR] \"{text}\" (phrase=\"{close_phrase}\" score={close_score:.3f})")
+            lines.append(f"[CLOSE-ASR] \"{text}\" (phrase=\"{close_phrase}\" score={close_score:.3f})")
         elif close_hit and idx0 >= 0:
-            print(
+            lines.append(
                 f"[CLOSE-IGNORED] \"{text}\" (phrase=\"{close_phrase}\" score={close_score:.3f}) "
-                f"because dialog option idx0={idx0} score={sc1:.3f}",
-                flush=True,
+                f"because dialog option idx0={idx0} score={sc1:.3f}"
             )
 
-        print("--- TIMINGS ---")
-        print(f"utt_sec={vad_stats['utt_sec']:.2f}s  tail_sil={vad_stats['tail_sil_ms']:.0f}ms")
-        print(f"t_wait={vad_stats['t_wait']:.3f}s  t_capture={vad_stats['t_vad']:.3f}s")
-        print(f"t_wav={asr_stats.get('t_wav', 0.0):.3f}s  t_asr={asr_stats.get('t_asr', asr_stats.get('t_whisper', 0.0)):.3f}s")
-        print(f"t_match={t_match:.4f}s  t_send={t_send:.4f}s")
-        print(f"t_total={(t_total1 - t_total0):.3f}s  -> {res_str}")
-
-        print("--- TOP ---")
-        for rank, (sc, idx, opt) in enumerate(scores[:3], 1):
-            print(f"{rank}. idx0={idx} score={sc:.3f} | {opt}")
+        lines += (
+            "--- TIMINGS ---",
+            f"utt_sec={vad_stats['utt_sec']:.2f}s  tail_sil={vad_stats['tail_sil_ms']:.0f}ms",
+            f"t_wait={vad_stats['t_wait']:.3f}s  t_capture={vad_stats['t_vad']:.3f}s",
+            f"t_wav={asr_stats.get('t_wav', 0.0):.3f}s  t_asr={asr_stats.get('t_asr', asr_stats.get('t_whisper', 0.0)):.3f}s",
+            f"t_match={t_match:.4f}s  t_send={t_send:.4f}s",
+            f"t_total={(t_total1 - t_total0):.3f}s  -> {res_str}",
+            "--- TOP ---",
+        )
+        lines += (f"{rank}. idx0={idx} score={sc:.3f} | {opt}" for rank, (sc, idx, opt) in enumerate(scores[:3], 1))
+        print("\n".join(lines), flush=True)
 
     def run(self) -> None:
         while True:
@@ -1260,7 +1366,6 @@ def _warmup_runtime(audio: AudioPipeline, rec: Recognizer, shouts_enable: bool)
         )
         parts.append(f"Whisper.Model={rec.model_size}")
         parts.append(f"Whisper.BeamSize={rec.whisper_beam}")
-        parts.append(f"Whisper.InMemAudio={int(rec.use_inmem_audio)}")
     elif rec.asr_engine == "vosk":
         parts.append(f"Vosk.Model={rec.vosk_model_name}")
 
@@ -1280,7 +1385,7 @@ def _warmup_runtime(audio: AudioPipeline, rec: Recognizer, shouts_enable: bool)
         raise RuntimeError(f"Unknown ASR engine: {rec.asr_engine}")
 
     if audio.mode == "vad":
-        print("Loading Silero VAD (torch hub)…", flush=True)
+        print("Loading Silero VAD (onnxruntime)…", flush=True)
         audio.warmup()
         print("VAD loaded", flush=True)
 
@@ -1295,6 +1400,7 @@ def main(cfg=None):
     open_enable_open = _env_bool("DVC_OPEN_ENABLE_OPEN", bool(cfg.open_enable_open))
     shouts_enable = _env_bool("DVC_SHOUTS_ENABLE", bool(cfg.shouts_enable))
     close_enable_voice = _env_bool("DVC_CLOSE_ENABLE_VOICE", bool(cfg.close_enable_voice))
+    lang_overrides = _language_overrides(cfg)
 
     audio = AudioPipeline(cfg)
     matching.init(cfg)
@@ -1316,9 +1422,9 @@ def main(cfg=None):
             continue
 
         addr = PIPE_NAME
-        # Ensure the live "Waiting for client" line ends with a raw newline
-        # — print via the same Rich Console so the live render is properly terminated
-        _WAIT_CONSOLE.print("")
+        # Terminate the "Waiting for client" line before regular logging resumes
+        sys.__stdout__.write("\n")
+        sys.__stdout__.flush()
         log_success(f"Client connected: {addr}")
 
         reader = PipeReader()
@@ -1332,7 +1438,7 @@ def main(cfg=None):
                 pass
             continue
 
-        _apply_language_to_cfg(cfg, lang_key)
+        _apply_language_to_cfg(cfg, lang_key, lang_overrides)
         os.environ["DVC_VOSK_MODEL"] = str(cfg.vosk_model or "")
         os.environ["DVC_SHOUTS_VOSK_MODEL"] = str(cfg.shouts_vosk_model or "")
         os.environ["DVC_SHOUTS_LANG"] = str(cfg.shouts_language or "")
@@ -3,15 +3,15 @@ from __future__ import annotations
 import json
 import os
 import sys
-import tempfile
 import time
-import wave
+from collections import OrderedDict
+from functools import lru_cache
 from pathlib import Path
 
 import numpy as np
 
 import matching
-from config import ServerConfig
+from config import ServerConfig, dvc_cache_root
 from vosk_models import ensure_vosk_model
 from log_utils import setup_timestamped_print, log_warn, log_error
 
@@ -20,6 +20,9 @@ setup_timestamped_print()
 
 SR = 16000
 WAV_DEBUG_DIR_REL = "caches/vad_caps"
+# Power/item/command grammar recognizers kept alive at once; one combined command grammar is the hot case.
+# open, close, dialogue and the combined command grammar are live in one session.
+_REC_POOL_MAX = 4
 
 
 def _env_str(key: str, default: str) -> str:
@@ -45,16 +48,62 @@ def _pick_backend_device_compute(default_backend: str) -> tuple[str, str]:
     return "cpu", "int8"
 
 
-def _wav_write_int16(path: Path, data: np.ndarray, sr: int = SR) -> None:
-    with wave.open(str(path), "wb") as wf:
-        wf.setnchannels(1)
-        wf.setsampwidth(2)
-        wf.setframerate(sr)
-        wf.writeframes(data.tobytes())
+_HEX_DIGITS = frozenset("0123456789ABCDEF")
 
 
+@lru_cache(maxsize=65536)
+def _normalize_formid(formid: str) -> str | None:
+    # Favorites resend the same FormIDs on every rebuild; parse each one once.
+    s = str(formid or "").strip().upper()
+    if not s:
+        return None
+
+    raw = s.removeprefix("0X")
+    # Already the canonical 8-digit form: no int round-trip needed.
+    if len(raw) == 8 and _HEX_DIGITS.issuperset(raw):
+        return "0x" + raw
+    try:
+        val = int(raw, 16)
+        return f"0x{val:08X}"
+    except Exception:
+        if s.startswith("0X"):
+            return "0x" + s[2:]
+        return s
+
+
+_I16_SCALE = np.float32(1.0 / 32768.0)
+
+
+def _pcm16_to_float32(pcm16: np.ndarray) -> np.ndarray:
+    # One ufunc pass widens and scales together; no intermediate float32 copy.
+    return np.multiply(pcm16, _I16_SCALE, dtype=np.float32)
+
+
+_KALDI_RECOGNIZER = None
+_WHISPER_MODEL = None
+
+
+def _kaldi_recognizer_cls():
+    # Resolved once: per-call `from vosk import ...` goes through the import lock every decode.
+    global _KALDI_RECOGNIZER
+    if _KALDI_RECOGNIZER is None:
+        from vosk import KaldiRecognizer
+        _KALDI_RECOGNIZER = KaldiRecognizer
+    return _KALDI_RECOGNIZER
+
+
+def _whisper_model_cls():
+    global _WHISPER_MODEL
+    if _WHISPER_MODEL is None:
+        from faster_whisper import WhisperModel
+        _WHISPER_MODEL = WhisperModel
+    return _WHISPER_MODEL
+
+
+@lru_cache(maxsize=1)
 def _maybe_add_cuda_dll_dirs() -> None:
     # Optional: helps ctranslate2 locate CUDA DLLs inside portable site-packages.
+    # DLL search dirs are process-wide, so one scan per process is enough.
     try:
         candidates: list[Path] = []
         for p in sys.path:
@@ -88,11 +137,25 @@ class Recognizer:
         self._whisper_model = None
         self._vosk_model = None
         self._vosk_shouts_model = None
-        self._vosk_open_grammar_json = None
-        self._vosk_close_grammar_json = None
         self._vosk_dialog_grammar_json = None
         self._vosk_dialog_rec = None
+        # dialogue recognizer currently fed from the capture loop, and its accumulated decode time
+        self._stream_rec = None
+        self._stream_t_accept = 0.0
+        # "open"/"close" -> (raw comma-separated phrases, grammar json)
+        self._phrases_json_cache: dict[str, tuple[str, str]] = {}
         self._shout_recognizer = None  # Lazy-loaded ShoutRecognizer
+        # Bumped whenever a command grammar changes so callers can cache derived output.
+        self.grammar_version = 0
+        self._grammar_info_cache: dict[str, tuple[int, tuple]] = {}
+        # kinds tuple -> (vosk recognizer, phrase routes); reset when grammar_version moves
+        self._command_grammars: dict[tuple[str, ...], tuple] = {}
+        # (model id, grammar json) -> KaldiRecognizer for every grammar decode, least recently used first
+        self._rec_pool: OrderedDict[tuple[int, str], object] = OrderedDict()
+        self._command_grammar_version = 0
+        # last capture handed to a Vosk decode and its raw bytes, shared across passes
+        self._pcm_src: np.ndarray | None = None
+        self._pcm_bytes_buf = b""
         self._allowed_shout_formids: set[str] | None = None
         self._allowed_shout_entries: list[tuple[str, str, str, str]] | None = None  # (plugin, formid, name, editorID)
         self._allowed_power_entries: list[tuple[str, str]] | None = None
@@ -100,21 +163,11 @@ class Recognizer:
         self._allowed_spell_entries: list[tuple[str, str]] | None = None
         self._allowed_potion_entries: list[tuple[str, str]] | None = None
         self._power_phrase_to_formid: dict[str, str] | None = None
-        self._vosk_power_grammar_json: str | None = None
-        self._vosk_power_rec = None
 
         # Weapon/Spell/Potion item recognition
         self._weapon_phrase_to_formid: dict[str, str] | None = None
-        self._vosk_weapon_grammar_json: str | None = None
-        self._vosk_weapon_rec = None
-
         self._spell_phrase_to_formid: dict[str, str] | None = None
-        self._vosk_spell_grammar_json: str | None = None
-        self._vosk_spell_rec = None
-
         self._potion_phrase_to_formid: dict[str, str] | None = None
-        self._vosk_potion_grammar_json: str | None = None
-        self._vosk_potion_rec = None
         self._whisper_voice_commands = False
 
         cfg_engine = self.cfg.asr_engine
@@ -144,20 +197,13 @@ class Recognizer:
         cfg_voice_cmd = bool(getattr(self.cfg, "whisper_voice_commands", False))
         self._whisper_voice_commands = _env_bool("DVC_WHISPER_VOICE_COMMANDS", cfg_voice_cmd)
 
-        cfg_inmem = bool(self.cfg.inmem_audio)
         self.debug_enabled = _env_bool("DVC_DEBUG", False)
         self.save_wav_enabled = _env_bool("DVC_SAVE_WAV", False)
         # WAV capture for debug is handled in pipe_server where we know context
         # (open/dialogue/close/shout) and can name files accordingly.
-        self.save_wav_debug = False
         self.wav_dir_rel = WAV_DEBUG_DIR_REL
-        self.use_inmem_audio = _env_bool("DVC_INMEM_AUDIO", cfg_inmem)
 
-        cache_root_env = os.environ.get("DVC_CACHE_DIR", "").strip()
-        cache_root = Path(cache_root_env).expanduser().resolve() if cache_root_env else (
-            Path(sys.executable).resolve().parent if bool(getattr(sys, "frozen", False)) else Path(__file__).resolve().parent
-        )
-        self.runtime_dir = cache_root
+        self.runtime_dir = dvc_cache_root()
         self.wav_debug_dir = (self.runtime_dir / self.wav_dir_rel).resolve()
         self.wav_debug_dir.mkdir(parents=True, exist_ok=True)
 
@@ -165,15 +211,15 @@ class Recognizer:
 
     def set_debug_enabled(self, enabled: bool) -> None:
         self.debug_enabled = bool(enabled)
-        # Keep ASR-internal WAV dump disabled (server-side contextual dump is used).
-        self.save_wav_debug = False
         os.environ["DVC_DEBUG"] = "1" if enabled else "0"
 
     def set_save_wav_enabled(self, enabled: bool) -> None:
         self.save_wav_enabled = bool(enabled)
+        if enabled:
+            self.wav_debug_dir.mkdir(parents=True, exist_ok=True)
         os.environ["DVC_SAVE_WAV"] = "1" if enabled else "0"
 
-    def _phrases_list(self, kind: str) -> list[str]:
+    def _phrases_raw(self, kind: str) -> str:
         # kind: "open" or "close"
         if kind == "open":
             default = self.cfg.open_phrases or self.cfg.open_phrases
@@ -186,26 +232,25 @@ class Recognizer:
             s = _env_str("DVC_CLOSE_PHRASES", str(default))
         else:
             s = ""
+        return str(s)
 
+    def _phrases_list(self, kind: str) -> list[str]:
         phrases: list[str] = []
-        for p in str(s).split(","):
+        for p in self._phrases_raw(kind).split(","):
             n = matching.normalize(p)
             if n:
                 phrases.append(n)
         return phrases
 
     def _vosk_grammar_json(self, kind: str) -> str:
-        phrases = self._phrases_list(kind)
+        # Steady state is the same env/cfg string every call: reuse its JSON.
+        raw = self._phrases_raw(kind)
+        cached = self._phrases_json_cache.get(kind)
+        if cached is not None and cached[0] == raw:
+            return cached[1]
         # Vosk expects JSON array of strings
-        j = json.dumps(phrases, ensure_ascii=False)
-        if kind == "open":
-            if self._vosk_open_grammar_json != j:
-                self._vosk_open_grammar_json = j
-            return self._vosk_open_grammar_json
-        if kind == "close":
-            if self._vosk_close_grammar_json != j:
-                self._vosk_close_grammar_json = j
-            return self._vosk_close_grammar_json
+        j = json.dumps(self._phrases_list(kind), ensure_ascii=False)
+        self._phrases_json_cache[kind] = (raw, j)
         return j
 
     def warmup(self) -> None:
@@ -218,9 +263,10 @@ class Recognizer:
     def _ensure_whisper(self):
         if self._whisper_model is not None:
             return self._whisper_model
-        _maybe_add_cuda_dll_dirs()
+        if self.device == "cuda":
+            _maybe_add_cuda_dll_dirs()
         try:
-            from faster_whisper import WhisperModel
+            WhisperModel = _whisper_model_cls()
         except Exception as e:
             raise RuntimeError(f"faster-whisper is not installed: {e}")
 
@@ -292,6 +338,23 @@ class Recognizer:
     def _whisper_commands_enabled(self) -> bool:
         return bool(self.asr_engine == "whisper" and self._whisper_voice_commands)
 
+    def _entry_phrases(self, entries: list[tuple[str, str]]) -> tuple[dict[str, str], list[str]]:
+        """(normalized phrase -> formid, raw name per kept phrase); first entry wins on duplicates."""
+        mapping: dict[str, str] = {}
+        names: list[str] = []
+        normalize = matching.normalize
+        for formid, name in entries:
+            raw = str(name or "")
+            phrase = normalize(raw)
+            if not phrase or phrase in mapping:
+                continue
+            formid_hex = self._normalize_shout_formid(formid)
+            if not formid_hex:
+                continue
+            mapping[phrase] = formid_hex
+            names.append(raw)
+        return mapping, names
+
     def _build_whisper_command_mapping(
         self,
         entries: list[tuple[str, str]] | None,
@@ -300,17 +363,8 @@ class Recognizer:
         """Build whisper mapping (normalized phrase -> formid) + raw phrases list."""
         if not entries:
             return None, []
-        mapping: dict[str, str] = {}
-        phrases: list[str] = []
-        for formid, name in entries:
-            formid_hex = self._normalize_shout_formid(formid)
-            phrase = matching.normalize(str(name or ""))
-            if not formid_hex or not phrase:
-                continue
-            if phrase in mapping:
-                continue
-            mapping[phrase] = formid_hex
-            phrases.append(str(name or "").strip())
+        mapping, names = self._entry_phrases(entries)
+        phrases = [name.strip() for name in names]
         if not phrases:
             return None, []
         return mapping, phrases
@@ -319,75 +373,42 @@ class Recognizer:
         model = self._ensure_whisper()
         t0 = time.perf_counter()
 
-        if self.use_inmem_audio:
-            t_wh0 = time.perf_counter()
-            audio = (pcm16.astype(np.float32) / 32768.0)
-            segments, _ = model.transcribe(audio, language=self.asr_lang, beam_size=self.whisper_beam)
-            text = "".join(seg.text for seg in segments).strip()
-            t_wh1 = time.perf_counter()
-            t_asr = (t_wh1 - t_wh0)
-            return text, {"t_wav": 0.0, "t_asr": t_asr, "t_whisper": t_asr, "t_total_io": (t_wh1 - t0), "wav_path": None}
-
-        wav_path: Path | None = None
-        t_wav0 = time.perf_counter()
-        try:
-            if self.save_wav_debug:
-                wav_path = self.wav_debug_dir / (
-                    time.strftime("%Y%m%d_%H%M%S") + f"_{int(time.time()*1000)%1000:03d}.wav"
-                )
-                _wav_write_int16(wav_path, pcm16, sr=SR)
-            else:
-                tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".wav")
-                tmp.close()
-                wav_path = Path(tmp.name)
-                _wav_write_int16(wav_path, pcm16, sr=SR)
-
-            t_wav1 = time.perf_counter()
-
-            t_wh0 = time.perf_counter()
-            segments, _ = model.transcribe(str(wav_path), language=self.asr_lang, beam_size=self.whisper_beam)
-            text = "".join(seg.text for seg in segments).strip()
-            t_wh1 = time.perf_counter()
-
-            t_asr = (t_wh1 - t_wh0)
-            return text, {
-                "t_wav": (t_wav1 - t_wav0),
-                "t_asr": t_asr,
-                "t_whisper": t_asr,
-                "t_total_io": (t_wh1 - t0),
-                "wav_path": str(wav_path) if self.save_wav_debug else None,
-            }
-        finally:
-            if wav_path and (not self.save_wav_debug):
-                try:
-                    wav_path.unlink(missing_ok=True)
-                except Exception:
-                    pass
+        # faster-whisper takes the float32 array directly: no WAV round-trip.
+        t_wh0 = time.perf_counter()
+        audio = _pcm16_to_float32(pcm16)
+        # Only the joined text is used, so skip timestamp tokens in the decoder loop.
+        segments, _ = model.transcribe(
+            audio, language=self.asr_lang, beam_size=self.whisper_beam, without_timestamps=True
+        )
+        text = "".join(seg.text for seg in segments).strip()
+        t_wh1 = time.perf_counter()
+        t_asr = (t_wh1 - t_wh0)
+        return text, {
+            "t_wav": 0.0,
+            "t_asr": t_asr,
+            "t_whisper": t_asr,
+            "t_total_io": (t_wh1 - t0),
+        }
+
+    def _pcm_bytes(self, pcm16: np.ndarray) -> bytes:
+        """Raw bytes of pcm16, converted once per capture instead of once per decode."""
+        if pcm16 is not self._pcm_src:
+            self._pcm_bytes_buf = pcm16.tobytes()
+            self._pcm_src = pcm16
+        return self._pcm_bytes_buf
 
     def _transcribe_vosk(self, pcm16: np.ndarray):
         model = self._ensure_vosk()
         try:
-            from vosk import KaldiRecognizer
+            KaldiRecognizer = _kaldi_recognizer_cls()
         except Exception as e:
             raise RuntimeError(f"Vosk is not installed: {e}")
 
         t0 = time.perf_counter()
-
-        wav_path: Path | None = None
-        t_wav = 0.0
-        if self.save_wav_debug:
-            t_w0 = time.perf_counter()
-            wav_path = self.wav_debug_dir / (
-                time.strftime("%Y%m%d_%H%M%S") + f"_{int(time.time()*1000)%1000:03d}.wav"
-            )
-            _wav_write_int16(wav_path, pcm16, sr=SR)
-            t_w1 = time.perf_counter()
-            t_wav = (t_w1 - t_w0)
-
         t_asr0 = time.perf_counter()
         rec = KaldiRecognizer(model, SR)
         rec.SetWords(False)
-        rec.AcceptWaveform(pcm16.tobytes())
+        rec.AcceptWaveform(self._pcm_bytes(pcm16))
         res = rec.FinalResult()
         try:
             data = json.loads(res)
@@ -397,28 +418,24 @@ class Recognizer:
         t_asr1 = time.perf_counter()
 
         return text, {
-            "t_wav": t_wav,
+            "t_wav": 0.0,
             "t_asr": (t_asr1 - t_asr0),
             "t_total_io": (t_asr1 - t0),
-            "wav_path": str(wav_path) if wav_path else None,
         }
 
-    def _transcribe_vosk_grammar(self, pcm16: np.ndarray, grammar_json: str):
+    def _transcribe_vosk_grammar(self, pcm16: np.ndarray, grammar_json: str, kind: str | None = None):
         model = self._ensure_vosk()
-        try:
-            from vosk import KaldiRecognizer
-        except Exception as e:
-            raise RuntimeError(f"Vosk is not installed: {e}")
 
         t0 = time.perf_counter()
         t_asr0 = time.perf_counter()
 
-        if not grammar_json or grammar_json == "[]":
+        # Compiling a grammar costs more than decoding a short utterance: reuse it from the pool.
+        rec = self._pooled_rec(grammar_json, (kind or "grammar").upper(), model)
+        if rec is None:
             return "", {"t_asr": 0.0, "t_total_io": (time.perf_counter() - t0)}
-
-        rec = KaldiRecognizer(model, SR, grammar_json)
+        rec.Reset()
         rec.SetWords(False)
-        rec.AcceptWaveform(pcm16.tobytes())
+        rec.AcceptWaveform(self._pcm_bytes(pcm16))
         res = rec.FinalResult()
         try:
             data = json.loads(res)
@@ -440,7 +457,7 @@ class Recognizer:
                 pass
 
         rec.SetWords(False)
-        rec.AcceptWaveform(pcm16.tobytes())
+        rec.AcceptWaveform(self._pcm_bytes(pcm16))
         res = rec.FinalResult()
         try:
             data = json.loads(res)
@@ -460,6 +477,44 @@ class Recognizer:
             return self._transcribe_whisper(pcm16)
         raise ValueError(f"Unknown ASR engine: {self.asr_engine}")
 
+    def start_dialogue_stream(self):
+        """Feed callback for decoding dialogue audio during capture, or None if not applicable.
+
+        Only the Vosk dialogue-grammar recognizer streams: AcceptWaveform is incremental,
+        so speech is decoded while the speaker is still talking.
+        """
+        rec = self._vosk_dialog_rec if self.asr_engine == "vosk" else None
+        self._stream_rec = rec
+        self._stream_t_accept = 0.0
+        if rec is None:
+            return None
+        rec.Reset()
+        rec.SetWords(False)
+
+        def _feed(chunk: np.ndarray) -> None:
+            t0 = time.perf_counter()
+            rec.AcceptWaveform(chunk.tobytes())
+            self._stream_t_accept += time.perf_counter() - t0
+
+        return _feed
+
+    def finish_dialogue_stream(self):
+        """(text, stats) for the audio fed since start_dialogue_stream."""
+        rec = self._stream_rec
+        self._stream_rec = None
+        if rec is None:
+            return "", {"t_asr": 0.0, "t_total_io": 0.0, "grammar": True}
+        t_asr0 = time.perf_counter()
+        res = rec.FinalResult()
+        try:
+            data = json.loads(res)
+            text = str(data.get("text", "")).strip()
+        except Exception:
+            text = ""
+        t_asr = time.perf_counter() - t_asr0
+        # t_asr is what remained after capture ended; t_stream already overlapped with it.
+        return text, {"t_asr": t_asr, "t_stream": self._stream_t_accept, "t_total_io": t_asr, "grammar": True}
+
     def transcribe_dialogue_grammar(self, pcm16: np.ndarray, grammar_json: str):
         if self.asr_engine == "vosk":
             return self._transcribe_vosk_grammar(pcm16, grammar_json)
@@ -473,13 +528,13 @@ class Recognizer:
     def transcribe_open(self, pcm16: np.ndarray):
         if self.asr_engine == "vosk":
             grammar = self._vosk_grammar_json("open")
-            return self._transcribe_vosk_grammar(pcm16, grammar)
+            return self._transcribe_vosk_grammar(pcm16, grammar, "open")
         return self.transcribe_dialogue(pcm16)
 
     def transcribe_close(self, pcm16: np.ndarray):
         if self.asr_engine == "vosk":
             grammar = self._vosk_grammar_json("close")
-            return self._transcribe_vosk_grammar(pcm16, grammar)
+            return self._transcribe_vosk_grammar(pcm16, grammar, "close")
         return self.transcribe_dialogue(pcm16)
 
     def set_dialog_grammar(self, phrases: list[str] | None) -> None:
@@ -493,16 +548,10 @@ class Recognizer:
             self._vosk_dialog_rec = None
             return
 
-        grammar_json = json.dumps(list(phrases), ensure_ascii=False)
+        grammar_json = matching.grammar_json(phrases)
         self._vosk_dialog_grammar_json = grammar_json
 
-        model = self._ensure_vosk()
-        try:
-            from vosk import KaldiRecognizer
-        except Exception as e:
-            raise RuntimeError(f"Vosk is not installed: {e}")
-
-        self._vosk_dialog_rec = KaldiRecognizer(model, SR, grammar_json)
+        self._vosk_dialog_rec = self._pooled_rec(grammar_json, "DIALOG", self._ensure_vosk())
 
     def clear_dialog_grammar(self) -> None:
         self._vosk_dialog_grammar_json = None
@@ -535,6 +584,7 @@ class Recognizer:
             backend=backend,
             lang=self.shouts_lang,
         )
+        self.grammar_version += 1
 
         # Apply current grammar restriction (if any)
         try:
@@ -553,32 +603,17 @@ class Recognizer:
         return self._shout_recognizer
 
     def _normalize_shout_formid(self, formid: str) -> str | None:
-        s = str(formid or "").strip().upper()
-        if not s:
-            return None
-
-        raw = s[2:] if s.startswith("0X") else s
-        try:
-            val = int(raw, 16)
-            return f"0x{val:08X}"
-        except Exception:
-            if s.startswith("0X"):
-                return "0x" + s[2:]
-            return s
+        return _normalize_formid(formid)
 
     def _normalize_shout_formids(self, formids: list[str] | set[str]) -> set[str]:
-        normalized: set[str] = set()
-        for formid in formids:
-            value = self._normalize_shout_formid(formid)
-            if value:
-                normalized.add(value)
-        return normalized
+        return {value for formid in formids if (value := _normalize_formid(formid))}
 
     def _apply_allowed_shout_formids(self) -> None:
         if self._shout_recognizer is not None and hasattr(self._shout_recognizer, "set_allowed_formids"):
             self._shout_recognizer.set_allowed_formids(self._allowed_shout_formids)
 
     def set_allowed_shout_formids(self, formids: list[str] | set[str] | None) -> None:
+        self.grammar_version += 1
         if formids is None:
             self._allowed_shout_formids = None
         else:
@@ -588,6 +623,7 @@ class Recognizer:
 
     def set_allowed_shout_entries(self, entries: list[tuple[str, str, str, str]] | None) -> None:
         """Accept (plugin, formid, name, editorID) entries from the pipe."""
+        self.grammar_version += 1
         self._allowed_shout_entries = entries
 
         if entries is None:
@@ -614,112 +650,86 @@ class Recognizer:
             self._apply_allowed_shout_formids()
 
     def set_allowed_power_entries(self, entries: list[tuple[str, str]] | None) -> None:
+        # Favorites resend every list when any one changes; an identical list needs no rebuild.
+        if entries and list(entries) == self._allowed_power_entries:
+            return
+        self.grammar_version += 1
         if not entries:
             self._allowed_power_entries = None
             self._power_phrase_to_formid = None
-            self._vosk_power_grammar_json = None
-            self._vosk_power_rec = None
             return
 
         if self._whisper_commands_enabled():
             mapping, _phrases = self._build_whisper_command_mapping(entries, "power")
             self._allowed_power_entries = list(entries)
             self._power_phrase_to_formid = mapping
-            self._vosk_power_grammar_json = None
-            self._vosk_power_rec = None
             return
 
-        mapping: dict[str, str] = {}
-        phrases: list[str] = []
+        mapping, _names = self._entry_phrases(entries)
 
-        for formid, name in entries:
-            formid_hex = self._normalize_shout_formid(formid)
-            phrase = matching.normalize(str(name or ""))
-            if not formid_hex or not phrase:
-                continue
-            if phrase in mapping:
-                continue
-            mapping[phrase] = formid_hex
-            phrases.append(phrase)
-
-        if not phrases:
+        if not mapping:
             self._allowed_power_entries = None
             self._power_phrase_to_formid = None
-            self._vosk_power_grammar_json = None
-            self._vosk_power_rec = None
             return
 
         self._allowed_power_entries = list(entries)
         self._power_phrase_to_formid = mapping
-        self._vosk_power_grammar_json = json.dumps(phrases, ensure_ascii=False)
-        self._vosk_power_rec = None
 
-        try:
-            from vosk import KaldiRecognizer
-            model = self._ensure_vosk_items()
-            if self._vosk_power_grammar_json and self._vosk_power_grammar_json != "[]":
-                self._vosk_power_rec = KaldiRecognizer(model, SR, self._vosk_power_grammar_json)
-        except Exception as e:
-            log_warn(f"[POWER][WARN] failed to init vosk power grammar: {e}")
-
-    def _build_item_grammar(self, entries: list[tuple[str, str]] | None, kind: str) -> tuple[dict[str, str] | None, str | None, object]:
-        """Build vosk grammar for item entries. Returns (phrase_to_formid, grammar_json, vosk_rec)."""
+    def _build_item_grammar(self, entries: list[tuple[str, str]] | None, kind: str) -> dict[str, str] | None:
+        """Phrase -> FormID map for item entries; the vosk grammar is built per command kind set."""
         if not entries:
-            return None, None, None
+            return None
 
         if self._whisper_commands_enabled():
             mapping, _phrases = self._build_whisper_command_mapping(entries, kind)
-            return mapping, None, None
+            return mapping
 
-        mapping: dict[str, str] = {}
-        phrases: list[str] = []
-
-        for formid, name in entries:
-            formid_hex = self._normalize_shout_formid(formid)
-            phrase = matching.normalize(str(name or ""))
-            if not formid_hex or not phrase:
-                continue
-            if phrase in mapping:
-                continue
-            mapping[phrase] = formid_hex
-            phrases.append(phrase)
-
-        if not phrases:
-            return None, None, None
-
-        grammar_json = json.dumps(phrases, ensure_ascii=False)
-        vosk_rec = None
+        mapping, _names = self._entry_phrases(entries)
+        return mapping or None
 
+    def _pooled_rec(self, grammar_json: str | None, tag: str, model):
+        """KaldiRecognizer for grammar_json on model from the shared LRU pool, built on a miss."""
+        if not grammar_json or grammar_json == "[]":
+            return None
+        pool = self._rec_pool
+        key = (id(model), grammar_json)
+        rec = pool.get(key)
+        if rec is not None:
+            pool.move_to_end(key)
+            return rec
         try:
-            from vosk import KaldiRecognizer
-            model = self._ensure_vosk_items()
-            if grammar_json and grammar_json != "[]":
-                vosk_rec = KaldiRecognizer(model, SR, grammar_json)
+            rec = _kaldi_recognizer_cls()(model, SR, grammar_json)
         except Exception as e:
-            log_warn(f"[{kind.upper()}][WARN] failed to init vosk grammar: {e}")
-
-        return mapping, grammar_json, vosk_rec
+            log_warn(f"[{tag}][WARN] failed to init vosk grammar: {e}")
+            return None
+        pool[key] = rec
+        if len(pool) > _REC_POOL_MAX:
+            pool.popitem(last=False)
+        return rec
 
     def set_allowed_weapons_entries(self, entries: list[tuple[str, str]] | None) -> None:
-        mapping, grammar_json, rec = self._build_item_grammar(entries, "weapon")
+        if entries and list(entries) == self._allowed_weapon_entries:
+            return
+        self.grammar_version += 1
+        mapping = self._build_item_grammar(entries, "weapon")
         self._allowed_weapon_entries = list(entries) if entries else None
         self._weapon_phrase_to_formid = mapping
-        self._vosk_weapon_grammar_json = grammar_json
-        self._vosk_weapon_rec = rec
 
     def set_allowed_spells_entries(self, entries: list[tuple[str, str]] | None) -> None:
-        mapping, grammar_json, rec = self._build_item_grammar(entries, "spell")
+        if entries and list(entries) == self._allowed_spell_entries:
+            return
+        self.grammar_version += 1
+        mapping = self._build_item_grammar(entries, "spell")
         self._allowed_spell_entries = list(entries) if entries else None
         self._spell_phrase_to_formid = mapping
-        self._vosk_spell_grammar_json = grammar_json
-        self._vosk_spell_rec = rec
 
     def set_allowed_potions_entries(self, entries: list[tuple[str, str]] | None) -> None:
-        mapping, grammar_json, rec = self._build_item_grammar(entries, "potion")
+        if entries and list(entries) == self._allowed_potion_entries:
+            return
+        self.grammar_version += 1
+        mapping = self._build_item_grammar(entries, "potion")
         self._allowed_potion_entries = list(entries) if entries else None
         self._potion_phrase_to_formid = mapping
-        self._vosk_potion_grammar_json = grammar_json
-        self._vosk_potion_rec = rec
 
     def _entries_to_phrases(self, entries: list[tuple[str, str]] | None) -> list[str]:
         if not entries:
@@ -750,73 +760,91 @@ class Recognizer:
             return int(entries), int(len(phrases)), list(phrases), lang, {}
         return 0, 0, [], lang, {}
 
-    def get_power_grammar_info(self) -> tuple[int, int, list[str]]:
-        entries = self._allowed_power_entries or []
-        phrases = self._entries_to_phrases(entries)
-        return int(len(entries)), int(len(phrases)), phrases
-
-    def get_weapon_grammar_info(self) -> tuple[int, int, list[str]]:
-        entries = self._allowed_weapon_entries or []
-        phrases = self._entries_to_phrases(entries)
-        return int(len(entries)), int(len(phrases)), phrases
-
-    def get_spell_grammar_info(self) -> tuple[int, int, list[str]]:
-        entries = self._allowed_spell_entries or []
-        phrases = self._entries_to_phrases(entries)
-        return int(len(entries)), int(len(phrases)), phrases
-
-    def get_potion_grammar_info(self) -> tuple[int, int, list[str]]:
-        entries = self._allowed_potion_entries or []
+    def _item_grammar_info(self, kind: str, entries: list[tuple[str, str]] | None) -> tuple[int, int, list[str], str]:
+        """(entries, phrases, phrase list, quoted phrases joined), rebuilt only when grammar_version moves."""
+        cached = self._grammar_info_cache.get(kind)
+        if cached is not None and cached[0] == self.grammar_version:
+            return cached[1]
+        entries = entries or []
         phrases = self._entries_to_phrases(entries)
-        return int(len(entries)), int(len(phrases)), phrases
-
-    def _recognize_item(self, pcm16: np.ndarray, vosk_rec, phrase_to_formid: dict[str, str] | None) -> tuple[str, float, str] | None:
-        if pcm16 is None or pcm16.size == 0:
+        info = (len(entries), len(phrases), phrases, ", ".join([f'"{p}"' for p in phrases]))
+        self._grammar_info_cache[kind] = (self.grammar_version, info)
+        return info
+
+    def get_power_grammar_info(self) -> tuple[int, int, list[str], str]:
+        return self._item_grammar_info("power", self._allowed_power_entries)
+
+    def get_weapon_grammar_info(self) -> tuple[int, int, list[str], str]:
+        return self._item_grammar_info("weapon", self._allowed_weapon_entries)
+
+    def get_spell_grammar_info(self) -> tuple[int, int, list[str], str]:
+        return self._item_grammar_info("spell", self._allowed_spell_entries)
+
+    def get_potion_grammar_info(self) -> tuple[int, int, list[str], str]:
+        return self._item_grammar_info("potion", self._allowed_potion_entries)
+
+    def _command_phrase_map(self, kind: str) -> dict[str, str] | None:
+        if kind == "power":
+            return self._power_phrase_to_formid
+        if kind == "weapon":
+            return self._weapon_phrase_to_formid
+        if kind == "spell":
+            return self._spell_phrase_to_formid
+        if kind == "potion":
+            return self._potion_phrase_to_formid
+        return None
+
+    def _command_grammar(self, kinds: tuple[str, ...]) -> tuple[str | None, dict[str, tuple[str, str]]]:
+        """(vosk grammar json or None, normalized phrase -> (kind, formid)) for the union of kinds."""
+        if self._command_grammar_version != self.grammar_version:
+            self._command_grammars = {}
+            self._command_grammar_version = self.grammar_version
+        cached = self._command_grammars.get(kinds)
+        if cached is not None:
+            return cached
+
+        # Earlier kinds win on phrase collisions, matching the old per-kind cascade order.
+        routes: dict[str, tuple[str, str]] = {}
+        for kind in kinds:
+            for phrase, formid_hex in (self._command_phrase_map(kind) or {}).items():
+                routes.setdefault(phrase, (kind, formid_hex))
+
+        grammar_json = None
+        if routes and not self._whisper_commands_enabled():
+            grammar_json = matching.grammar_json(routes)
+
+        cached = (grammar_json, routes)
+        self._command_grammars[kinds] = cached
+        return cached
+
+    def recognize_command(self, pcm16: np.ndarray, kinds: tuple[str, ...]) -> tuple[str, tuple[str, float, str]] | None:
+        """Decode once against the combined power/item grammar; returns (kind, (formid, score, text))."""
+        if pcm16 is None or pcm16.size == 0 or not kinds:
             return None
-        if vosk_rec is None or not phrase_to_formid:
+        grammar_json, routes = self._command_grammar(kinds)
+        if not routes:
             return None
+        vosk_rec = self._pooled_rec(grammar_json, "COMMAND", self._ensure_vosk_items()) if grammar_json else None
 
         try:
-            text, _ = self._transcribe_vosk_with_recognizer(vosk_rec, pcm16)
-            norm = matching.normalize(text)
-            formid_hex = phrase_to_formid.get(norm)
-            if formid_hex:
-                return (formid_hex, 1.0, text)
-            return None
+            if self._whisper_commands_enabled():
+                text, _ = self._transcribe_whisper(pcm16)
+            elif vosk_rec is not None:
+                text, _ = self._transcribe_vosk_with_recognizer(vosk_rec, pcm16)
+            else:
+                return None
         except Exception as e:
-            log_error(f"[ITEM][ERR] Recognition failed: {e}")
+            log_error(f"[COMMAND][ERR] Recognition failed: {e}")
             return None
 
-    def _recognize_item_whisper(self, pcm16: np.ndarray, phrase_to_formid: dict[str, str] | None) -> tuple[str, float, str] | None:
-        if pcm16 is None or pcm16.size == 0:
+        route = routes.get(matching.normalize(text))
+        if route is None:
             return None
-        if not phrase_to_formid:
-            return None
-        try:
-            text, _ = self._transcribe_whisper(pcm16)
-            norm = matching.normalize(text)
-            formid_hex = phrase_to_formid.get(norm)
-            if formid_hex:
-                return (formid_hex, 1.0, text)
-            return None
-        except Exception as e:
-            log_error(f"[ITEM][ERR] Recognition failed: {e}")
-            return None
-
-    def recognize_weapon(self, pcm16: np.ndarray) -> tuple[str, float, str] | None:
-        if self._whisper_commands_enabled():
-            return self._recognize_item_whisper(pcm16, self._weapon_phrase_to_formid)
-        return self._recognize_item(pcm16, self._vosk_weapon_rec, self._weapon_phrase_to_formid)
+        kind, formid_hex = route
+        return kind, (formid_hex, 1.0, text)
 
-    def recognize_spell(self, pcm16: np.ndarray) -> tuple[str, float, str] | None:
-        if self._whisper_commands_enabled():
-            return self._recognize_item_whisper(pcm16, self._spell_phrase_to_formid)
-        return self._recognize_item(pcm16, self._vosk_spell_rec, self._spell_phrase_to_formid)
-
-    def recognize_potion(self, pcm16: np.ndarray) -> tuple[str, float, str] | None:
-        if self._whisper_commands_enabled():
-            return self._recognize_item_whisper(pcm16, self._potion_phrase_to_formid)
-        return self._recognize_item(pcm16, self._vosk_potion_rec, self._potion_phrase_to_formid)
+    def has_command_grammar(self, kind: str) -> bool:
+        return bool(self._command_phrase_map(kind))
 
     def recognize_shout(self, pcm16: np.ndarray) -> tuple[str, str, int, float, str] | None:
         if pcm16 is None or pcm16.size == 0:
@@ -835,84 +863,6 @@ class Recognizer:
             log_error(f"[SHOUT][ERR] Recognition failed: {e}")
             return None
 
-    def recognize_power(self, pcm16: np.ndarray) -> tuple[str, float, str] | None:
-        if pcm16 is None or pcm16.size == 0:
-            return None
-
-        if self._whisper_commands_enabled():
-            if not self._power_phrase_to_formid:
-                return None
-            try:
-                text, _ = self._transcribe_whisper(pcm16)
-                norm = matching.normalize(text)
-                formid_hex = (self._power_phrase_to_formid or {}).get(norm)
-                if formid_hex:
-                    return (formid_hex, 1.0, text)
-                return None
-            except Exception as e:
-                log_error(f"[POWER][ERR] Recognition failed: {e}")
-                return None
-
-        if self._vosk_power_rec is None or not self._power_phrase_to_formid:
-            return None
-
-        try:
-            text, _ = self._transcribe_vosk_with_recognizer(self._vosk_power_rec, pcm16)
-            norm = matching.normalize(text)
-            formid_hex = (self._power_phrase_to_formid or {}).get(norm)
-            if formid_hex:
-                return (formid_hex, 1.0, text)
-            return None
-        except Exception as e:
-            log_error(f"[POWER][ERR] Recognition failed: {e}")
-            return None
-
-    def recognize_power_debug(self, pcm16: np.ndarray) -> tuple[tuple[str, float, str] | None, dict]:
-        dbg: dict = {
-            "reason": "init",
-            "phrases": int(len(self._power_phrase_to_formid or {})),
-        }
-
-        if pcm16 is None or pcm16.size == 0:
-            dbg["reason"] = "empty_audio"
-            return None, dbg
-
-        if self._whisper_commands_enabled():
-            if not self._power_phrase_to_formid:
-                dbg["reason"] = "powers_disabled"
-                return None, dbg
-            try:
-                text, _ = self._transcribe_whisper(pcm16)
-                norm = matching.normalize(text)
-                formid_hex = (self._power_phrase_to_formid or {}).get(norm)
-                if not formid_hex:
-                    dbg["reason"] = "no_match"
-                    return None, dbg
-                dbg["reason"] = "ok"
-                return (formid_hex, 1.0, text), dbg
-            except Exception as e:
-                dbg["reason"] = "error"
-                dbg["error"] = str(e)
-                return None, dbg
-
-        if self._vosk_power_rec is None or not self._power_phrase_to_formid:
-            dbg["reason"] = "powers_disabled"
-            return None, dbg
-
-        try:
-            text, _ = self._transcribe_vosk_with_recognizer(self._vosk_power_rec, pcm16)
-            norm = matching.normalize(text)
-            formid_hex = (self._power_phrase_to_formid or {}).get(norm)
-            if not formid_hex:
-                dbg["reason"] = "no_match"
-                return None, dbg
-            dbg["reason"] = "ok"
-            return (formid_hex, 1.0, text), dbg
-        except Exception as e:
-            dbg["reason"] = "error"
-            dbg["error"] = str(e)
-            return None, dbg
-
     def recognize_shout_debug(self, pcm16: np.ndarray) -> tuple[tuple[str, str, int, float, str] | None, dict]:
         def _shout_vosk_model_label() -> str:
             name = (self.shouts_vosk_model_name or self.vosk_model_name or "").strip()
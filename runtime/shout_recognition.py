@@ -381,7 +381,7 @@ def build_shout_specific_grammar(
 def _vosk_recognize_raw(
     *,
     model,  # VoskModel
-    pcm16: np.ndarray,
+    pcm16: np.ndarray | bytes,
     grammar_list: list[str],
     sr: int = SR,
 ) -> tuple[str, list[str], list[float], float, dict]:
@@ -390,7 +390,9 @@ def _vosk_recognize_raw(
     rec = KaldiRecognizer(model, int(sr), json.dumps(grammar_list, ensure_ascii=False))
     rec.SetWords(True)
 
-    rec.AcceptWaveform(np.asarray(pcm16, dtype=np.int16).tobytes())
+    if not isinstance(pcm16, bytes):
+        pcm16 = np.asarray(pcm16, dtype=np.int16).tobytes()
+    rec.AcceptWaveform(pcm16)
     raw = json.loads(rec.FinalResult() or "{}")
 
     raw_text = str(raw.get("text") or "").strip()
@@ -455,10 +457,13 @@ def two_phase_recognize(
         result.reason = "EMPTY_AUDIO"
         return result
 
+    # Both phases decode the same audio; convert it once.
+    pcm_bytes = np.asarray(pcm16, dtype=np.int16).tobytes()
+
     # Phase A
     raw_text_a, raw_words_a, _confs_a, score_a, _ = _vosk_recognize_raw(
         model=model,
-        pcm16=pcm16,
+        pcm16=pcm_bytes,
         grammar_list=phase_a_grammar,
         sr=sr,
     )
@@ -488,7 +493,7 @@ def two_phase_recognize(
     # Phase B
     raw_text_b, raw_words_b, _confs_b, score_b, _ = _vosk_recognize_raw(
         model=model,
-        pcm16=pcm16,
+        pcm16=pcm_bytes,
         grammar_list=combined_phrases,
         sr=sr,
     )